@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+import http_client
+from storage import CACHE_DIR, lazy_default, open_db
+
+# --- Site-wide asset inventory ---
+# Pages of one site share most of their CSS, JS and images, so asset URLs are
+# collected from every crawled page and deduplicated before anything is
+# fetched. Each unique asset is probed once (HEAD, or a one-byte Range GET when
+# HEAD gives no size) on a bounded pool, and its metadata is kept in SQLite so
+# later crawls and the page-weight fallback reuse it until it is ASSET_MAX_AGE old.
+
+PROBE_WORKERS = 16
+PROBE_TIMEOUT = 10
+ASSET_MAX_AGE = 24 * 3600
+TEXT_ASSET_KINDS = ('script', 'stylesheet')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS assets (
+    url TEXT PRIMARY KEY,
+    status_code INTEGER,
+    size INTEGER,
+    content_type TEXT,
+    cache_control TEXT,
+    content_encoding TEXT,
+    error TEXT,
+    checked_at REAL NOT NULL
+)
+'''
+_FIELDS = ('status_code', 'size', 'content_type', 'cache_control', 'content_encoding', 'error')
+
+
+def _absolute(page, src):
+    try:
+        return urljoin(page.base_url, src)
+    except ValueError:  # unparsable, e.g. https://[domain]/x; dropped below with the non-HTTP URLs
+        return ''
+
+
+def page_assets(page):
+    """[(kind, absolute url, render_blocking)] for the page's scripts, stylesheets and images, deduplicated."""
+    assets = {}
+    for kind, src, render_blocking in page.assets:
+        assets.setdefault(_absolute(page, src), (kind, render_blocking))
+    for src, _ in page.images:
+        if src:
+            assets.setdefault(_absolute(page, src), ('image', False))
+    return [(kind, url, render_blocking) for url, (kind, render_blocking) in assets.items()
+            if url.startswith(('http://', 'https://'))]
+
+
+def probe_asset(url, timeout=PROBE_TIMEOUT):
+    """Metadata for one asset: status, transfer size and caching/encoding headers."""
+    meta = dict.fromkeys(_FIELDS)
+    try:
+        response = http_client.head(url, timeout=timeout)
+        length = response.headers.get('content-length', '')
+        if response.ok and not length.isdigit():
+            with http_client.fetch(url, timeout=timeout, headers={'Range': 'bytes=0-0'}, stream=True) as ranged:
+                total = ranged.headers.get('content-range', '').rpartition('/')[2]
+                length = total if ranged.status_code == 206 else ranged.headers.get('content-length', '')
+        meta.update(
+            status_code=response.status_code,
+            size=int(length) if response.ok and length.isdigit() else None,
+            content_type=response.headers.get('content-type'),
+            cache_control=response.headers.get('cache-control'),
+            content_encoding=response.headers.get('content-encoding'),
+        )
+    except requests.exceptions.RequestException as e:
+        meta['error'] = str(e)
+    return meta
+
+
+class AssetCache:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = open_db(path, _SCHEMA)
+
+    def get_many(self, urls, max_age=ASSET_MAX_AGE):
+        """{url: metadata} for the urls checked within max_age seconds."""
+        found = {}
+        urls = list(urls)
+        with self._lock:
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT url, {', '.join(_FIELDS)} FROM assets WHERE checked_at >= ? "
+                    f"AND url IN ({', '.join('?' * len(chunk))})",
+                    (time.time() - max_age, *chunk),
+                ).fetchall()
+                found.update((row[0], dict(zip(_FIELDS, row[1:]))) for row in rows)
+        return found
+
+    def put_many(self, metas):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO assets (url, {', '.join(_FIELDS)}, checked_at) "
+                f"VALUES (?{', ?' * len(_FIELDS)}, ?)",
+                [(url, *(meta[field] for field in _FIELDS), now) for url, meta in metas.items()],
+            )
+
+
+def asset_metadata(urls, workers=PROBE_WORKERS, cache=None, max_age=ASSET_MAX_AGE):
+    """{url: metadata} for unique urls, probing only those the cache does not hold."""
+    cache = cache or default_cache()
+    urls = list(dict.fromkeys(urls))
+    metas = cache.get_many(urls, max_age)
+    missing = [url for url in urls if url not in metas]
+    if missing:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asset") as executor:
+            probed = dict(zip(missing, executor.map(probe_asset, missing)))
+        cache.put_many(probed)
+        metas.update(probed)
+    return metas
+
+
+def build_inventory(pages, workers=PROBE_WORKERS, cache=None):
+    """One row per unique asset across all pages, with how many pages use it."""
+    kinds, used_by = {}, Counter()
+    for page in pages:
+        if page.error:
+            continue
+        for kind, url, _ in page_assets(page):
+            kinds.setdefault(url, kind)
+            used_by[url] += 1
+
+    metas = asset_metadata(kinds, workers, cache)
+    rows = [{'url': url, 'kind': kind, 'pages': used_by[url], **metas[url]} for url, kind in kinds.items()]
+    rows.sort(key=lambda row: (row['size'] or 0) * row['pages'], reverse=True)
+    return rows
+
+
+def inventory_summary(rows):
+    loaded = [row for row in rows if not row['error'] and (row['status_code'] or 0) < 400]
+    return {
+        'assets': len(rows),
+        'total_bytes': sum(row['size'] or 0 for row in loaded),
+        'broken': len(rows) - len(loaded),
+        'uncompressed_text': sum(1 for row in loaded if row['kind'] in TEXT_ASSET_KINDS and not row['content_encoding']),
+        'no_cache_policy': sum(1 for row in loaded if not row['cache_control']),
+    }
+
+
+@lazy_default
+def default_cache():
+    return AssetCache(os.path.join(CACHE_DIR, 'assets.sqlite'))
@@ -0,0 +1,193 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import audit_core
+import http_client
+from seo_checks import CHECK_NAMES
+from sitemaps import SITEMAP_ERRORS, is_sitemap, iter_sitemap_urls
+
+# --- Headless batch auditing ---
+# Usage:
+#   python audit_cli.py urls.txt sitemap.xml -o results.jsonl --workers 32 --parse-workers 8
+#   python audit_cli.py https://example.com/sitemap.xml -o results.parquet
+# Inputs are files with one URL per line ('-' reads stdin) or sitemaps (local
+# paths or URLs ending in .xml / .xml.gz). Results are written as they finish.
+
+PARQUET_BATCH_ROWS = 500
+
+
+def _report_sitemap(location, error):
+    print(f"Skipping sitemap {location}: {error}", file=sys.stderr)
+
+
+def sitemap_input_urls(location):
+    """A sitemap's page URLs; sitemaps that fail to load are reported on stderr and skipped."""
+    try:
+        yield from iter_sitemap_urls(location, _report_sitemap)
+    except SITEMAP_ERRORS as e:
+        _report_sitemap(location, e)
+
+
+def iter_input_urls(sources):
+    for source in sources:
+        if is_sitemap(source):
+            yield from sitemap_input_urls(source)
+            continue
+        handle = sys.stdin if source == '-' else open(source, encoding='utf-8')
+        with handle:
+            for line in handle:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if is_sitemap(line):
+                    yield from sitemap_input_urls(line)
+                else:
+                    yield line if line.startswith(('http://', 'https://')) else 'https://' + line
+
+
+def run_audits(urls, workers, max_bytes, parse_workers=0):
+    """Audit URLs concurrently and yield records in completion order.
+
+    At most 2 * workers audits are queued at a time, so URL sources are consumed
+    lazily and large sitemaps never sit in memory as futures. With parse_workers,
+    download threads hand raw pages to a process pool for parsing. A URL whose
+    audit raises comes back as an error record instead of ending the run.
+    """
+    parse_pool = audit_core.ParsePool(parse_workers) if parse_workers else None
+
+    def audit(url):
+        try:
+            return audit_core.audit_page(url, max_bytes)
+        except Exception as e:  # one broken page must not end the batch
+            return audit_core.PageRecord(url, error=f"Audit failed: {e}")
+
+    def submit(executor, url):
+        if parse_pool is None:
+            return executor.submit(audit, url)
+        audited = Future()
+
+        def fetched(future):
+            # audited must always resolve: run_audits waits on it.
+            try:
+                parsed = parse_pool.submit(url, future.result())
+            except Exception as e:  # a download that raised, or a broken process pool
+                parsed = audit_core.PageRecord(url, error=f"Audit failed: {e}")
+            if isinstance(parsed, Future):
+                parsed.add_done_callback(lambda done: audited.set_result(done.result()))
+            else:
+                audited.set_result(parsed)
+
+        executor.submit(audit_core.fetch_page, url, max_bytes).add_done_callback(fetched)
+        return audited
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audit") as executor:
+            pending = set()
+            for url in urls:
+                pending.add(submit(executor, url))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        if parse_pool is not None:
+            parse_pool.close()
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._handle = sys.stdout if path in (None, '-') else open(path, 'w', encoding='utf-8')
+
+    def write(self, row):
+        self._handle.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self._handle.flush()
+
+    def close(self):
+        if self._handle is not sys.stdout:
+            self._handle.close()
+
+
+class ParquetWriter:
+    def __init__(self, path, with_keyword=False):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow (pip install pyarrow).")
+        self._pa = pa
+        self._schema = self._row_schema(pa, with_keyword)
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+
+    @staticmethod
+    def _row_schema(pa, with_keyword):
+        # Fixed schema, so a first batch full of nulls cannot fix a column to the null type.
+        fields = [
+            ('url', pa.string()), ('status_code', pa.int64()), ('error', pa.string()),
+            ('title', pa.string()), ('meta_description', pa.string()), ('h1_count', pa.int64()),
+            ('link_count', pa.int64()), ('image_count', pa.int64()), ('canonical', pa.string()),
+            ('truncated', pa.bool_()), ('content_hash', pa.string()), ('keywords', pa.list_(pa.string())),
+            ('checks', pa.struct([(name, pa.bool_()) for name in CHECK_NAMES])),
+        ]
+        if with_keyword:
+            fields.append(('keyword_analysis', pa.struct([
+                ('keyword', pa.string()), ('count', pa.int64()), ('word_count', pa.int64()),
+                ('density', pa.float64()), ('in_title', pa.bool_()), ('in_meta_description', pa.bool_()),
+                ('in_h1', pa.bool_()),
+            ])))
+        return pa.schema(fields)
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit lists of URLs or sitemaps without the Streamlit UI.")
+    parser.add_argument('sources', nargs='+', help="URL list files ('-' for stdin) or sitemap paths/URLs")
+    parser.add_argument('-o', '--output', default='-', help="Output path (.jsonl or .parquet); default stdout JSONL")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], help="Output format (default: from the extension)")
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent page downloads")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="Processes for HTML parsing (0 parses in the download threads)")
+    parser.add_argument('--keyword', help="Target keyword for keyword analysis")
+    parser.add_argument('--max-page-mb', type=float, default=http_client.DEFAULT_MAX_BYTES / 2**20,
+                        help="Download cap per page in MB")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    if output_format == 'parquet' and args.output == '-':
+        parser.error("Parquet output needs a file path (-o results.parquet).")
+    writer = ParquetWriter(args.output, bool(args.keyword)) if output_format == 'parquet' else JsonlWriter(args.output)
+
+    started, audited, failed = time.monotonic(), 0, 0
+    try:
+        for record in run_audits(iter_input_urls(args.sources), args.workers, int(args.max_page_mb * 2**20),
+                                 args.parse_workers):
+            writer.write(audit_core.audit_row(record, args.keyword))
+            audited += 1
+            failed += bool(record.error)
+    finally:
+        writer.close()
+    print(f"Audited {audited} URLs ({failed} failed) in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import requests
+
+import http_client
+from page_cache import default_cache, conditional_headers
+from page_record import PageRecord, extract_record, content_hash, kept_headers
+from psi_history import default_history
+from psi_report import PSI_CATEGORIES, slim_report
+from seo_checks import seo_checks, CHECK_NAMES
+from urls import STRIP_PARAMS, normalize_url
+
+# --- UI-free audit core ---
+# Everything here runs without Streamlit, so the same analysis backs the
+# Streamlit apps (which add st.cache_data on top) and the batch CLI.
+
+# A simple list of common English stop words for keyword analysis
+STOP_WORDS = set([
+    'a', 'about', 'above', 'after', 'again', 'against', 'all', 'am', 'an', 'and', 'any', 'are', "aren't", 'as', 'at',
+    'be', 'because', 'been', 'before', 'being', 'below', 'between', 'both', 'but', 'by', 'can', "can't", 'cannot',
+    'com', 'could', "couldn't", 'did', "didn't", 'do', 'does', "doesn't", 'doing', "don't", 'down', 'during',
+    'each', 'few', 'for', 'from', 'further', 'had', "hadn't", 'has', "hasn't", 'have', "haven't", 'having', 'he',
+    "he'd", "he'll", "he's", 'her', 'here', "here's", 'hers', 'herself', 'him', 'himself', 'his', 'how', "how's",
+    'i', "i'd", "i'll", "i'm", "i've", 'if', 'in', 'into', 'is', "isn't", 'it', "it's", 'its', 'itself', "let's",
+    'me', 'more', 'most', "mustn't", 'my', 'myself', 'no', 'nor', 'not', 'of', 'off', 'on', 'once', 'only', 'or',
+    'other', 'ought', 'our', 'ours', 'ourselves', 'out', 'over', 'own', 'r', 'same', 'she', "she'd", "she'll",
+    "she's", 'should', "shouldn't", 'so', 'some', 'such', 'than', 'that', "that's", 'the', 'their', 'theirs',
+    'them', 'themselves', 'then', 'there', "there's", 'these', 'they', "they'd", "they'll", "they're", "they've",
+    'this', 'those', 'through', 'to', 'too', 'under', 'until', 'up', 'very', 'was', "wasn't", 'we', "we'd",
+    "we'll", "we're", "we've", 'were', "weren't", 'what', "what's", 'when', "when's", 'where', "where's",
+    'which', 'while', 'who', "who's", 'whom', 'why', "why's", 'with', "won't", 'would', "wouldn't", 'you',
+    "you'd", "you'll", "you're", "you've", 'your', 'yours', 'yourself', 'yourselves', 'www', 'https'
+])
+
+PSI_ENDPOINT = os.environ.get('WEB_AUDIT_PSI_ENDPOINT', "https://www.googleapis.com/pagespeedonline/v5/runPagespeed")
+PSI_STRATEGIES = ('mobile', 'desktop')
+
+
+def fetch_page(url, max_bytes=http_client.DEFAULT_MAX_BYTES):
+    """I/O stage: a finished PageRecord (cache hit or error), or a Download still to be parsed."""
+    page_cache = default_cache()
+    cached = page_cache.get(url)
+    try:
+        page = http_client.download_html(url, max_bytes=max_bytes, timeout=20, headers=conditional_headers(cached))
+    except requests.exceptions.RequestException as e:
+        status_code = e.response.status_code if e.response is not None else None
+        return PageRecord(url, status_code=status_code, error=str(e))
+    if page.status_code == 304 and cached is not None:
+        page_cache.touch(url)
+        return cached
+    page.headers = kept_headers(page.headers)
+    if cached is not None and cached.content_hash == content_hash(page.body):
+        cached.headers = page.headers
+        page_cache.put(cached)
+        return cached
+    return page
+
+
+def parse_download(url, download):
+    """CPU stage: extraction and keyword counting. Needs no shared state, so it can run in a worker process."""
+    record = extract_record(url, download.status_code, download.headers, download.body, download.encoding,
+                            download.truncated, download.url)
+    record.keywords = tuple(suggest_keywords(record))
+    return record
+
+
+def audit_page(url, max_bytes=http_client.DEFAULT_MAX_BYTES):
+    fetched = fetch_page(url, max_bytes)
+    if isinstance(fetched, PageRecord):
+        return fetched
+    record = parse_download(url, fetched)
+    default_cache().put(record)
+    return record
+
+
+def _parse_in_worker(url, download):
+    record = parse_download(url, download)
+    record.body = b''  # the parent still holds the body; don't pickle it back
+    return record
+
+
+class ParsePool:
+    """Process pool for the parse stage.
+
+    I/O threads call submit() with whatever fetch_page returned; finished records
+    pass straight through, downloads come back as a Future of the PageRecord.
+    """
+
+    def __init__(self, workers):
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, url, fetched):
+        if isinstance(fetched, PageRecord):
+            return fetched
+        result = Future()
+
+        def parsed(future):
+            try:
+                record = future.result()
+            except Exception as e:
+                result.set_result(PageRecord(url, status_code=fetched.status_code, error=f"Parsing failed: {e}"))
+                return
+            record.body = fetched.body
+            try:
+                default_cache().put(record)
+            finally:
+                result.set_result(record)
+
+        self._executor.submit(_parse_in_worker, url, fetched).add_done_callback(parsed)
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def fetch_pagespeed(url, api_key, strategy='mobile', endpoint=None, session=None):
+    """One raw PSI call: the parsed JSON, or a requests exception (HTTPError keeps the response)."""
+    params = [('url', url), ('strategy', strategy)]
+    params += [('category', category_id) for category_id in PSI_CATEGORIES.values()]
+    params.append(('key', api_key))
+    response = (session or http_client.get_session()).get(endpoint or PSI_ENDPOINT, params=params, timeout=90)
+    response.raise_for_status()
+    return response.json()
+
+
+def pagespeed_report(url, api_key, strategy='mobile', endpoint=None, session=None):
+    """Run PSI, slim the response to a PsiReport and add it to the PSI history."""
+    report = slim_report(fetch_pagespeed(url, api_key, strategy, endpoint, session), strategy)
+    default_history().record(url, report)
+    return report
+
+
+def run_pagespeed_insights(url, api_key, strategy='mobile', endpoint=None):
+    """(PsiReport, None) on success, (None, error message) otherwise."""
+    if not api_key: return None, "Google PageSpeed API Key not found."
+    try:
+        return pagespeed_report(url, api_key, strategy, endpoint), None
+    except requests.exceptions.RequestException as e:
+        return None, str(e)
+
+
+def suggest_keywords(page):
+    if not page or not page.text: return []
+    words = re.findall(r'\b\w{4,15}\b', page.text.lower())
+    meaningful_words = [word for word in words if word not in STOP_WORDS and not word.isdigit()]
+    return [word for word, _ in Counter(meaningful_words).most_common(10)]
+
+
+def get_internal_links(base_url, page, strip_params=STRIP_PARAMS, cache=None):
+    """Same-host links of the page as {normalized URL: URL as linked}.
+
+    The normalized form (urls.normalize_url) is only the key that tells two
+    links to one page apart; the linked URL, without its fragment, is the one
+    to fetch, since /blog and /blog/ need not be the same to the server.
+    Links resolve against the URL the page was finally served from.
+    cache is an optional dict shared by the pages of one crawl: links that do
+    not depend on the page's path (absolute URLs and /paths, which most
+    navigation links are) are then resolved once per crawl.
+    """
+    base_url = page.final_url or base_url
+    site = urlparse(normalize_url(base_url)).netloc
+    origin = urlparse(base_url)[:2]
+
+    def resolve(href):
+        try:
+            url = urldefrag(urljoin(base_url, href))[0]
+            key = normalize_url(url, strip_params)
+        except ValueError:  # unparsable, e.g. https://[domain]/x or a non-numeric port
+            return None
+        return (key, url) if urlparse(key).netloc == site else None
+
+    links = {}
+    for href, _ in page.links:
+        if cache is not None and href.startswith(('/', 'http://', 'https://')):
+            cache_key = (origin, href)
+            if cache_key not in cache:
+                cache[cache_key] = resolve(href)
+            link = cache[cache_key]
+        else:
+            link = resolve(href)
+        if link:
+            links.setdefault(*link)
+    return links
+
+
+def keyword_analysis(page, keyword):
+    keyword = keyword.lower()
+    page_text = page.text.lower()
+    keyword_count = page_text.count(keyword)
+    word_count = len(page_text.split())
+    return {
+        'keyword': keyword,
+        'count': keyword_count,
+        'word_count': word_count,
+        'density': (keyword_count / word_count * 100) if word_count > 0 else 0,
+        'in_title': keyword in page.title.lower(),
+        'in_meta_description': keyword in page.meta_description.lower(),
+        'in_h1': any(keyword in h1.lower() for h1 in page.h1_tags),
+    }
+
+
+def audit_row(page, keyword=None):
+    """Flat, JSON-serialisable summary of one audited page (one CLI output line)."""
+    checks = seo_checks(page)
+    row = {
+        'url': page.url,
+        'status_code': page.status_code,
+        'error': page.error,
+        'title': page.title,
+        'meta_description': page.meta_description,
+        'h1_count': len(page.h1_tags),
+        'link_count': len(page.links),
+        'image_count': len(page.images),
+        'canonical': page.canonical,
+        'truncated': page.truncated,
+        'content_hash': page.content_hash,
+        'keywords': list(page.keywords) if page.keywords is not None else suggest_keywords(page),
+        'checks': {name: checks.get(name) for name in CHECK_NAMES},
+    }
+    if keyword:
+        row['keyword_analysis'] = keyword_analysis(page, keyword) if not page.error else None
+    return row
@@ -0,0 +1,412 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+from urllib.parse import urlparse
+
+import asset_inventory
+import audit_core
+import crawl_store
+import http_client
+import incremental
+import link_checker
+import link_graph
+import page_weight
+import politeness
+import psi_scheduler
+import robots
+import work_queue
+from crawler import crawl_site
+from sitemaps import discover_sitemaps, iter_site_sitemap_urls
+from urls import STRIP_PARAMS, normalize_url
+
+# --- Concurrent audit job graph ---
+# An audit is a set of named background jobs that all start when the audit is
+# requested: the main page, PageSpeed Insights (with a static page-weight
+# fallback), robots.txt (from the per-host cache in robots.py), sitemap
+# discovery and the crawl. A job that needs other jobs' output is submitted
+# only once their futures are done, so no pool thread sits waiting on another
+# job and a busy pool cannot queue the main page behind its own dependents.
+# Nothing blocks the UI; each tab joins only the jobs it displays. The
+# executors are shared by all sessions and outlive script reruns.
+# Jobs that can run for many minutes (crawls, distributed-queue waits, link
+# checks, PSI batches) are submitted with long_running and get their own
+# pool of LONG_JOB_CONCURRENCY threads; while it is full, further long jobs
+# queue there, and the short jobs never wait behind them.
+# PageSpeed Insights calls take up to 90 s each, so the main page's strategies
+# run at once on their own small pool; crawled pages go through the
+# quota-aware batch scheduler in psi_scheduler.
+
+PSI_CONCURRENCY = 4
+PSI_BATCH_MAX_AGE = 24 * 3600
+QUEUE_POLL_INTERVAL = 1.0
+QUEUE_STALL_TIMEOUT = 600  # give up on a distributed crawl that no worker has advanced for this long
+LONG_JOB_CONCURRENCY = 8
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="audit-job")
+_long_executor = ThreadPoolExecutor(max_workers=LONG_JOB_CONCURRENCY, thread_name_prefix="audit-long-job")
+_psi_executor = ThreadPoolExecutor(max_workers=PSI_CONCURRENCY, thread_name_prefix="psi")
+
+
+# Crawl options stored with a crawl job, so resuming it crawls the same way.
+_CRAWL_OPTIONS = ('max_pages', 'max_depth', 'seed_from_sitemaps', 'respect_robots', 'strip_params')
+_active_crawls = {}  # {crawl job id: AuditJobs} for crawls running in this process
+
+
+class AuditJobs:
+    def __init__(self, url):
+        self.url = url
+        self.crawl_job_id = None
+        self.progress = {}
+        self._futures = {}
+
+    def submit(self, name, fn, *args, after=(), long_running=False, **kwargs):
+        """Run fn on a shared executor once the futures in after (None entries ignored) are done.
+
+        long_running jobs get the pool for long jobs instead, so they cannot starve the short ones.
+        """
+        executor = _long_executor if long_running else _executor
+        self._futures[name] = _submit_after(executor, [future for future in after if future is not None],
+                                            fn, *args, **kwargs)
+        return self._futures[name]
+
+    def __contains__(self, name):
+        return name in self._futures
+
+    def future(self, name):
+        return self._futures[name]
+
+    def done(self, *names):
+        return all(self._futures[name].done() for name in names)
+
+    def result(self, name, timeout=None):
+        return self._futures[name].result(timeout)
+
+    def wait_any(self, names, timeout=None):
+        """Block until one of the named jobs finishes or the timeout passes."""
+        wait([self._futures[name] for name in names], timeout=timeout, return_when=FIRST_COMPLETED)
+
+
+def _submit_after(executor, futures, fn, *args, **kwargs):
+    if not futures:
+        return executor.submit(fn, *args, **kwargs)
+    result = Future()
+    pending = set(futures)
+    lock = threading.Lock()
+
+    def run():
+        try:
+            result.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            result.set_exception(e)
+
+    def ready(done):
+        with lock:
+            pending.discard(done)
+            if pending:
+                return
+        executor.submit(run)
+
+    for future in list(pending):
+        future.add_done_callback(ready)
+    return result
+
+
+def _psi_job(run_pagespeed_insights, urls, strategies):
+    """{url: {strategy: (results, error)}} for every pair, fetched concurrently."""
+    futures = {(url, strategy): _psi_executor.submit(run_pagespeed_insights, url, strategy)
+               for url in urls for strategy in strategies}
+    results = {url: {} for url in urls}
+    for (url, strategy), future in futures.items():
+        results[url][strategy] = future.result()
+    return results
+
+
+def _page_psi_job(run_pagespeed_insights, url, strategies):
+    return _psi_job(run_pagespeed_insights, [url], strategies)[url]
+
+
+def _crawl_psi_job(jobs, api_key, crawl_future, strategies, max_urls):
+    """Every crawled page (up to max_urls) through the quota-aware PSI scheduler.
+
+    The batch is per site, so results younger than PSI_BATCH_MAX_AGE are reused
+    and a batch cut short by the daily quota resumes on the next audit.
+    """
+    crawl_data, _ = crawl_future.result()
+    urls = [page.url for page in crawl_data[1:] if not page.error][:max_urls]
+    if not api_key:
+        return {url: {strategy: (None, "Google PageSpeed API Key not found.") for strategy in strategies}
+                for url in urls}
+
+    queue = psi_scheduler.default_queue()
+    batch = f"site:{urlparse(jobs.url).netloc}"
+    urls = queue.enqueue(batch, urls, strategies, max_age=PSI_BATCH_MAX_AGE)
+
+    def on_result(url, strategy, result, error):
+        jobs.progress['psi_crawl'] = jobs.progress.get('psi_crawl', 0) + 1
+
+    # run() works through every pending row of the site's batch, including rows
+    # a quota-cut earlier audit left behind, and skips rows that are still fresh.
+    jobs.progress['psi_crawl_total'] = len(queue.pending(batch))
+    progress = psi_scheduler.PsiScheduler(api_key, queue).run(batch, on_result)
+    jobs.progress['psi_quota_spent'] = progress['quota_spent']
+
+    results = {url: {} for url in urls}
+    for url, strategy, result, error in queue.results(batch, urls):
+        if strategy in strategies:
+            results[url][strategy] = (result, error)
+    return results
+
+
+def _page_weight_job(main_future, psi_future):
+    """Static page-weight analysis, only when PSI gave no performance result."""
+    if any(report and report.has_performance for report, _ in psi_future.result().values()):
+        return None
+    page = main_future.result()
+    return None if page.error else page_weight.analyze_page_weight(page)
+
+
+def _assets_job(crawl_future):
+    crawl_data, _ = crawl_future.result()
+    return asset_inventory.build_inventory(crawl_data)
+
+
+def _link_graph_job(crawl_future, strip_params=STRIP_PARAMS):
+    """Click depth, inlinks, PageRank and orphan flags of the crawled pages (see link_graph.py)."""
+    crawl_data, _ = crawl_future.result()
+    if len(crawl_data) <= 1:
+        return None
+    return link_graph.LinkGraph.from_pages(crawl_data, strip_params).metrics()
+
+
+def _links_job(jobs, crawl_future, url, per_host, strip_params=STRIP_PARAMS, robots_future=None):
+    crawl_data, _ = crawl_future.result()
+    if robots_future is None:
+        allow_url = None
+    else:
+        rules, site = robots_future.result(), urlparse(url).netloc
+
+        def allow_url(link):  # robots.txt only speaks for the audited site
+            return urlparse(link).netloc != site or rules.can_fetch(link)
+
+    def on_checked(link, result):
+        jobs.progress['links'] = jobs.progress.get('links', 0) + 1
+
+    return link_checker.check_site_links(crawl_data, url, per_host, strip_params=strip_params, allow_url=allow_url,
+                                         on_checked=on_checked)
+
+
+def _drop_content(page):
+    """Free a crawled page's body and visible text.
+
+    Once its links are extracted nothing reads them, and on a large crawl
+    they would dominate the memory of crawl_data and of st.cache_data.
+    """
+    page.body = b''
+    page.text = ''
+    return page
+
+
+def _robots_job(url):
+    return robots.default_cache().get(url)
+
+
+def _sitemaps_job(url, robots_future):
+    return discover_sitemaps(url, robots_future.result().sitemaps)
+
+
+def _crawl_job(jobs, url, main_future, fetch_page, max_pages, max_depth, concurrency, per_host,
+               parse_processes=0, incremental_mode=False, sitemaps_future=None, robots_future=None,
+               strip_params=STRIP_PARAMS, initial_per_host=politeness.DEFAULT_INITIAL, checkpoint=None):
+    main_page = main_future.result()
+    crawl_data = [main_page]
+    if checkpoint is not None:
+        jobs.progress['crawl'] = checkpoint.done_count()
+    if max_pages > 1 and not main_page.error and (main_page.links or sitemaps_future):
+        http_client.configure_host_pool(url, per_host)
+        key = partial(normalize_url, strip_params=strip_params)
+        site = urlparse(key(main_page.base_url)).netloc
+
+        def fetch(page_url):
+            return main_page if page_url == url else fetch_page(page_url)
+
+        def extract_links(page_url, result):
+            if result.error:
+                return ()
+            return list(audit_core.get_internal_links(page_url, result, strip_params).values())
+
+        throttle = politeness.default_throttle()
+
+        def on_result(page_url, depth, result):
+            # Each fetch returns a fresh record; the main page is shared, and
+            # page weight and keyword analysis still need its content.
+            if result is not main_page:
+                _drop_content(result)
+            jobs.progress['crawl'] = jobs.progress.get('crawl', 0) + 1
+            jobs.progress['crawl_per_host'] = throttle.stats().get(site, (initial_per_host,))[0]
+
+        options = dict(on_result=on_result, max_pages=max_pages, max_depth=max_depth,
+                       concurrency=concurrency, per_host=per_host, key=key)
+        crawl_delay = None
+        if robots_future is not None:
+            rules = robots_future.result()
+            options['allow_url'] = rules.can_fetch
+            crawl_delay = rules.crawl_delay()
+        throttle.configure(main_page.base_url, initial=min(initial_per_host, per_host), maximum=per_host,
+                           crawl_delay=crawl_delay)
+        if sitemaps_future is not None:
+            sitemap_urls = iter_site_sitemap_urls(sitemaps_future.result())
+            options['seed_urls'] = (page_url for page_url in sitemap_urls if urlparse(key(page_url)).netloc == site)
+        if checkpoint is not None:
+            options['checkpoint'] = checkpoint
+            previous = [_drop_content(page) for page in checkpoint.results()]
+        else:
+            previous = []
+        try:
+            if parse_processes:
+                with audit_core.ParsePool(parse_processes) as parse_pool:
+                    results = crawl_site(url, fetch, extract_links, parse_page=parse_pool.submit, **options)
+            else:
+                results = crawl_site(url, fetch, extract_links, **options)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        crawl_data += [page for page in previous + results if key(page.url) != key(url)]
+    if checkpoint is not None:
+        crawl_store.default_store().finish_job(checkpoint.job_id)
+    return crawl_data, _crawl_diff(url, crawl_data, incremental_mode, strip_params)
+
+
+def _queued_crawl_job(jobs, url, main_future, max_bytes, max_pages, max_depth, per_host, incremental_mode=False,
+                      robots_future=None, strip_params=STRIP_PARAMS):
+    """Crawl through the shared work queue and wait for crawl_worker.py processes to finish it."""
+    main_page = main_future.result()
+    crawl_data = [main_page]
+    if max_pages > 1 and not main_page.error and main_page.links:
+        interval = 0.0
+        if robots_future is not None:
+            interval = robots_future.result().crawl_delay() or 0.0
+        queue = work_queue.default_queue()
+        options = {'max_pages': max_pages, 'max_depth': max_depth, 'max_bytes': max_bytes,
+                   'respect_robots': robots_future is not None, 'strip_params': list(strip_params)}
+        job_id = queue.submit(url, options, max_leased=per_host, interval=interval)
+        jobs.progress['crawl_queue_job'] = job_id
+        last_change, last_counts = time.monotonic(), None
+        while True:
+            counts = queue.progress(job_id)
+            jobs.progress['crawl'] = counts['done']
+            if not counts['queued'] and not counts['leased']:
+                break
+            if counts != last_counts:
+                last_change, last_counts = time.monotonic(), counts
+            elif time.monotonic() - last_change > QUEUE_STALL_TIMEOUT:
+                break
+            time.sleep(QUEUE_POLL_INTERVAL)
+        start_key = normalize_url(url, strip_params)
+        crawl_data += [_drop_content(page) for page in queue.results(job_id)
+                       if normalize_url(page.url, strip_params) != start_key]
+    return crawl_data, _crawl_diff(url, crawl_data, incremental_mode, strip_params)
+
+
+def _crawl_diff(url, crawl_data, incremental_mode, strip_params=STRIP_PARAMS):
+    """Diff against the site's previous crawl snapshot (and save the new one), in incremental mode.
+
+    The diff's 'reused' is the number of pages whose checks were taken from the snapshot.
+    """
+    if not incremental_mode:
+        return None
+    site = urlparse(url).netloc
+    store = incremental.default_store()
+    previous = store.load(site)
+    snapshot, reused = incremental.build_snapshot(crawl_data, previous, strip_params)
+    store.save(site, snapshot)
+    return dict(incremental.diff_snapshots(previous, snapshot), reused=reused) if previous else None
+
+
+def start_audit(url, audit_page, run_pagespeed_insights, max_bytes=http_client.DEFAULT_MAX_BYTES,
+                max_pages=1, max_depth=2, concurrency=16, per_host=8, parse_processes=0, incremental_mode=False,
+                psi_strategies=('mobile',), psi_crawl_pages=0, psi_api_key=None, inventory_assets=False,
+                seed_from_sitemaps=False, respect_robots=True, strip_params=STRIP_PARAMS,
+                initial_per_host=politeness.DEFAULT_INITIAL, resume_job=None, distributed=False,
+                check_links=False):
+    """Start every job of an audit and return immediately.
+
+    audit_page and run_pagespeed_insights(url, strategy) are passed in so the
+    apps can hand over their st.cache_data-wrapped versions. 'psi' holds the
+    main page's results per strategy; with psi_crawl_pages, 'psi_crawl' queues
+    the same strategies for that many crawled pages once the crawl is done.
+    With inventory_assets, 'assets' inventories the crawled pages' assets.
+    A crawl also gets 'link_graph', the internal link metrics of its pages.
+    With check_links, 'links' checks every link, image and asset URL of the
+    crawled pages for broken targets (see link_checker.py).
+    With seed_from_sitemaps, the crawl also streams URLs from the discovered
+    sitemaps into its frontier. With respect_robots, the crawl skips URLs the
+    site's robots.txt disallows and honours its Crawl-delay. Crawled links are
+    deduplicated by their urls.normalize_url form, which ignores the
+    strip_params query parameters. Connections to the site start at
+    initial_per_host and adapt between one and per_host (see politeness.py).
+
+    A crawl is logged to crawl_store under jobs.crawl_job_id. resume_job
+    continues an interrupted crawl with the URL and crawl options it was
+    started with, skipping the pages it already finished; if that crawl is
+    still running in this process, its AuditJobs is returned instead.
+
+    With distributed, the crawl is submitted to the shared work queue and
+    crawled by crawl_worker.py processes instead, with per_host as the limit
+    for all workers together; jobs.progress['crawl_queue_job'] holds its id.
+    The queue keeps its own state, so these crawls are not logged for resuming
+    and do not seed from sitemaps.
+    """
+    store = crawl_store.default_store()
+    if resume_job is not None:
+        running = _active_crawls.get(resume_job)
+        if running is not None:
+            return running
+        job = store.job(resume_job)
+        if job is None:
+            raise ValueError(f"Unknown crawl job: {resume_job}")
+        url = job['start_url']
+        max_pages, max_depth, seed_from_sitemaps, respect_robots, strip_params = (
+            job['options'][name] for name in _CRAWL_OPTIONS)
+
+    jobs = AuditJobs(url)
+    checkpoint = None
+    if max_pages > 1 and not distributed:
+        jobs.crawl_job_id = resume_job or store.create_job(url, dict(zip(_CRAWL_OPTIONS, (
+            max_pages, max_depth, seed_from_sitemaps, respect_robots, list(strip_params)))))
+        checkpoint = store.checkpoint(jobs.crawl_job_id)
+        _active_crawls[jobs.crawl_job_id] = jobs
+    main_future = jobs.submit('main_page', audit_page, url, max_bytes)
+    psi_future = jobs.submit('psi', _page_psi_job, run_pagespeed_insights, url, psi_strategies)
+    jobs.submit('page_weight', _page_weight_job, main_future, psi_future, after=(main_future, psi_future))
+    robots_future = jobs.submit('robots', _robots_job, url)
+    sitemaps_future = jobs.submit('sitemaps', _sitemaps_job, url, robots_future, after=(robots_future,))
+    crawl_robots = robots_future if respect_robots else None
+
+    if distributed:
+        crawl_future = jobs.submit('crawl', _queued_crawl_job, jobs, url, main_future, max_bytes, max_pages,
+                                   max_depth, per_host, incremental_mode, crawl_robots, strip_params,
+                                   after=(main_future, crawl_robots), long_running=True)
+    else:
+        if parse_processes:
+            fetch_page = partial(audit_core.fetch_page, max_bytes=max_bytes)
+        else:
+            fetch_page = partial(audit_page, max_bytes=max_bytes)
+        crawl_sitemaps = sitemaps_future if seed_from_sitemaps else None
+        crawl_future = jobs.submit('crawl', _crawl_job, jobs, url, main_future, fetch_page, max_pages, max_depth,
+                                   concurrency, per_host, parse_processes, incremental_mode, crawl_sitemaps,
+                                   crawl_robots, strip_params, initial_per_host, checkpoint,
+                                   after=(main_future, crawl_sitemaps, crawl_robots), long_running=True)
+    if checkpoint is not None:
+        crawl_future.add_done_callback(lambda _: _active_crawls.pop(jobs.crawl_job_id, None))
+    if max_pages > 1:
+        jobs.submit('link_graph', _link_graph_job, crawl_future, strip_params, after=(crawl_future,))
+    if check_links:
+        jobs.submit('links', _links_job, jobs, crawl_future, url, per_host, strip_params, crawl_robots,
+                    after=(crawl_future, crawl_robots), long_running=True)
+    if inventory_assets:
+        jobs.submit('assets', _assets_job, crawl_future, after=(crawl_future,))
+    if psi_crawl_pages:
+        jobs.submit('psi_crawl', _crawl_psi_job, jobs, psi_api_key, crawl_future, psi_strategies, psi_crawl_pages,
+                    after=(crawl_future,), long_running=True)
+    return jobs
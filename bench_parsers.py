@@ -0,0 +1,75 @@
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import parser_backends
+from html_extract import extract_signals
+
+# --- Parser backend benchmark ---
+# Usage: python bench_parsers.py saved_pages/ [--repeat 5]
+# Each backend runs in its own process so peak RSS is not shared between them.
+# tracemalloc only sees Python allocations; max RSS includes the C libraries.
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    for path in sorted(Path(corpus_dir).rglob('*')):
+        if path.suffix.lower() in ('.html', '.htm') and path.is_file():
+            pages.append(path.read_bytes().decode('utf-8', errors='replace'))
+    return pages
+
+
+def _measure(backend, pages, repeat, queue):
+    extract_signals(pages[0], backend)  # import and warm up outside the measurement
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for html in pages:
+            extract_signals(html, backend)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    for html in pages:
+        extract_signals(html, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((best, peak, max_rss_kb))
+
+
+def run_benchmark(pages, repeat):
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for backend in parser_backends.available_backends():
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(backend, pages, repeat, queue))
+        process.start()
+        best, peak, max_rss_kb = queue.get()
+        process.join()
+        results.append((backend, best, peak, max_rss_kb))
+    return sorted(results, key=lambda row: row[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare HTML parser backends on saved pages.")
+    parser.add_argument('corpus', help="Directory of saved .html pages")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed passes per backend (best is reported)")
+    args = parser.parse_args(argv)
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        sys.exit(f"No .html files found under {args.corpus}")
+    corpus_mb = sum(len(html) for html in pages) / 1e6
+    print(f"Corpus: {len(pages)} pages, {corpus_mb:.1f} MB of text, best of {args.repeat} passes")
+    print(f"{'backend':<12} {'total s':>9} {'ms/page':>9} {'MB/s':>8} {'py peak MB':>11} {'max RSS MB':>11}")
+    for backend, best, peak, max_rss_kb in run_benchmark(pages, args.repeat):
+        print(f"{backend:<12} {best:>9.3f} {best / len(pages) * 1000:>9.2f} {corpus_mb / best:>8.1f} "
+              f"{peak / 1e6:>11.1f} {max_rss_kb / 1024:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import copy
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import CACHE_DIR, lazy_default, open_db
+
+# --- Resumable crawl log ---
+# A crawl with a job id writes its frontier and its finished pages to SQLite
+# as it goes: every URL the crawl has seen is a row, queued or done, and a done
+# row holds the page's record (body dropped, compressed). A crawl cut short by
+# a refresh, a dropped connection or a restart picks up from the queued rows
+# and never fetches a done URL again. Writes go through one background thread
+# per crawl, in order, so the crawl's event loop never waits on the disk and a
+# page is only marked done together with the links it added.
+
+CRAWL_RETENTION = 7 * 24 * 3600
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS crawl_jobs (
+    job_id TEXT PRIMARY KEY,
+    start_url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawl_urls (
+    job_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    record BLOB,
+    UNIQUE (job_id, url)
+);
+CREATE INDEX IF NOT EXISTS crawl_urls_state ON crawl_urls (job_id, state);
+'''
+
+
+class CrawlStore:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = open_db(path, _SCHEMA)
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+
+    def create_job(self, start_url, options):
+        """Register a new crawl and return its job id."""
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO crawl_jobs (job_id, start_url, options, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'running', ?, ?)", (job_id, start_url, json.dumps(options), now, now),
+            )
+        return job_id
+
+    def job(self, job_id):
+        """{'job_id', 'start_url', 'options', 'status', 'done', 'queued'} or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT job_id, start_url, options, status, updated_at FROM crawl_jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+            counts = dict(self._conn.execute(
+                'SELECT state, COUNT(*) FROM crawl_urls WHERE job_id = ? GROUP BY state', (job_id,)
+            ).fetchall())
+        if row is None:
+            return None
+        return {'job_id': row[0], 'start_url': row[1], 'options': json.loads(row[2]), 'status': row[3],
+                'updated_at': row[4], 'done': counts.get('done', 0), 'queued': counts.get('queued', 0)}
+
+    def unfinished_jobs(self):
+        """Jobs that stopped before their crawl finished, newest first."""
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT job_id FROM crawl_jobs WHERE status = 'running' ORDER BY updated_at DESC"
+            ).fetchall()]
+        return [self.job(job_id) for job_id in ids]
+
+    def finish_job(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE crawl_jobs SET status = 'done', updated_at = ? WHERE job_id = ?",
+                               (time.time(), job_id))
+
+    def prune(self, max_age=CRAWL_RETENTION):
+        """Drop jobs untouched for max_age seconds, with their logs."""
+        with self._lock, self._conn:
+            old = [row[0] for row in self._conn.execute(
+                'SELECT job_id FROM crawl_jobs WHERE updated_at < ?', (time.time() - max_age,)
+            ).fetchall()]
+            self._conn.executemany('DELETE FROM crawl_urls WHERE job_id = ?', [(job_id,) for job_id in old])
+            self._conn.executemany('DELETE FROM crawl_jobs WHERE job_id = ?', [(job_id,) for job_id in old])
+
+    def checkpoint(self, job_id):
+        return CrawlCheckpoint(self, job_id)
+
+
+class CrawlCheckpoint:
+    """The crawler's view of one job's log (see crawler.crawl)."""
+
+    def __init__(self, store, job_id):
+        self.job_id = job_id
+        self._store = store
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl-log")
+
+    def _query(self, sql, *params):
+        with self._store._lock:
+            return self._store._conn.execute(sql, (self.job_id, *params)).fetchall()
+
+    def known_urls(self, chunk=10000):
+        """Every URL the job has queued or finished, read in chunks."""
+        last = 0
+        while True:
+            rows = self._query('SELECT rowid, url FROM crawl_urls WHERE job_id = ? AND rowid > ? '
+                               'ORDER BY rowid LIMIT ?', last, chunk)
+            for _, url in rows:
+                yield url
+            if len(rows) < chunk:
+                return
+            last = rows[-1][0]
+
+    def queued(self):
+        """[(url, depth)] still to crawl, in the order they were queued."""
+        return self._query("SELECT url, depth FROM crawl_urls WHERE job_id = ? AND state = 'queued' ORDER BY rowid")
+
+    def done_count(self):
+        return self._query("SELECT COUNT(*) FROM crawl_urls WHERE job_id = ? AND state = 'done'")[0][0]
+
+    def results(self):
+        """Yield the finished records in the order they finished."""
+        for (blob,) in self._query("SELECT record FROM crawl_urls WHERE job_id = ? AND state = 'done' ORDER BY rowid"):
+            yield pickle.loads(zlib.decompress(blob))
+
+    def _write(self, queued, done=None):
+        conn = self._store._conn
+        with self._store._lock, conn:
+            if done is not None:
+                url, depth, blob = done
+                conn.execute(
+                    "INSERT OR REPLACE INTO crawl_urls (job_id, url, depth, state, record) VALUES (?, ?, ?, 'done', ?)",
+                    (self.job_id, url, depth, blob),
+                )
+            conn.executemany(
+                "INSERT OR IGNORE INTO crawl_urls (job_id, url, depth, state) VALUES (?, ?, ?, 'queued')",
+                [(self.job_id, url, depth) for url, depth in queued],
+            )
+            conn.execute('UPDATE crawl_jobs SET updated_at = ? WHERE job_id = ?', (time.time(), self.job_id))
+
+    def enqueue(self, items):
+        """Log (url, depth) pairs as queued; returns at once."""
+        items = list(items)
+        if items:
+            self._writer.submit(self._write, items)
+
+    def finish(self, url, depth, result, new_links):
+        """Log a finished page together with the (url, depth) pairs it queued; returns at once."""
+        def write():
+            record = copy.copy(result)
+            record.body = b''
+            blob = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+            self._write(new_links, (url, depth, blob))
+        self._writer.submit(write)
+
+    def close(self):
+        """Wait for every pending write."""
+        self._writer.shutdown(wait=True)
+
+
+@lazy_default
+def default_store():
+    store = CrawlStore(os.path.join(CACHE_DIR, 'crawls.sqlite'))
+    store.prune()
+    return store
@@ -0,0 +1,103 @@
+import argparse
+import copy
+import os
+import socket
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import audit_core
+import http_client
+import robots
+import work_queue
+from urls import STRIP_PARAMS
+
+# --- Distributed crawl worker ---
+# Usage:
+#   python crawl_worker.py --threads 16          (start as many as the machine takes)
+#   python crawl_worker.py --once                (drain the queue and exit)
+# A worker leases URLs from the shared work queue (work_queue.py), audits them
+# and acks each page with its record and its internal links. The queue decides
+# which host may be contacted when, so any number of workers together stay
+# within each host's limits. The Streamlit app only submits crawls and reads
+# the results back.
+
+POLL_INTERVAL = 1.0
+
+
+class CrawlWorker:
+    def __init__(self, queue, threads=16, batch=None, worker_id=None):
+        self.queue = queue
+        self.threads = threads
+        self.batch = batch or threads * 2
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._options = {}
+
+    def _job_options(self, job_id):
+        options = self._options.get(job_id)
+        if options is None:
+            options = self._options[job_id] = self.queue.options(job_id) or {}
+        return options
+
+    def process(self, lease):
+        delay = lease.start_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        options = self._job_options(lease.job_id)
+        try:
+            record = audit_core.audit_page(lease.url, options.get('max_bytes', http_client.DEFAULT_MAX_BYTES))
+            links = ()
+            if not record.error:
+                links = audit_core.get_internal_links(lease.url, record,
+                                                      options.get('strip_params', STRIP_PARAMS)).values()
+                if options.get('respect_robots', True):
+                    rules = robots.default_cache()
+                    links = [link for link in links if rules.can_fetch(link)]
+            record = copy.copy(record)
+            record.body = b''
+        except Exception as e:
+            self.queue.fail(self.worker_id, lease, f"{type(e).__name__}: {e}")
+            return False
+        return self.queue.ack(self.worker_id, lease, record, sorted(links))
+
+    def run(self, once=False):
+        """Lease and audit URLs until interrupted (or, with once, until the queue is empty)."""
+        processed, running = 0, set()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="crawl-worker") as executor:
+            while True:
+                # Keep a batch leased ahead, but no more: leases that sit in a
+                # busy worker hold back the host's slots from the others.
+                if len(running) < self.threads:
+                    leases = self.queue.lease(self.worker_id, self.batch - len(running))
+                    running.update(executor.submit(self.process, lease) for lease in leases)
+                if not running:
+                    if once and not self.queue.pending():
+                        return processed
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                done, running = wait(running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                processed += sum(future.result() for future in done)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl pages from the shared work queue.")
+    parser.add_argument('--queue', help="Work queue database (default: the app's cache directory)")
+    parser.add_argument('--threads', type=int, default=16, help="Concurrent page downloads")
+    parser.add_argument('--batch', type=int, help="URLs leased at a time (default: twice --threads)")
+    parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+    args = parser.parse_args(argv)
+
+    queue = work_queue.WorkQueue(args.queue) if args.queue else work_queue.default_queue()
+    worker = CrawlWorker(queue, args.threads, args.batch)
+    started = time.monotonic()
+    try:
+        processed = worker.run(args.once)
+    except KeyboardInterrupt:
+        processed = None
+    if processed is not None:
+        print(f"Worker {worker.worker_id} crawled {processed} pages in {time.monotonic() - started:.1f}s",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
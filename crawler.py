@@ -0,0 +1,147 @@
+import asyncio
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from urls import UrlSet
+
+# --- Breadth-first site crawler ---
+# The frontier is a FIFO queue of (url, depth) pairs, so pages are scheduled
+# level by level. `fetch_page` is the blocking per-page worker (e.g. audit_page)
+# and runs on a thread pool sized to the connection budget; `extract_links`
+# turns a finished result into the URLs to enqueue next. An optional
+# `parse_page(url, fetched)` stage runs after the connection slot is released
+# and may return a concurrent.futures.Future (e.g. from a process pool).
+# `seed_urls` is an optional lazy iterable of extra depth-0 URLs (e.g. from a
+# sitemap); it is pulled in small batches off the event loop whenever the
+# frontier runs low, so millions of seeds never sit in memory at once.
+# URLs are deduplicated in a UrlSet of 64-bit hashes, which keeps the
+# seen-set small on million-URL sites. `key` (e.g. urls.normalize_url) maps a
+# URL to what is deduplicated, so spellings of one page are fetched once, but
+# the URL itself is what gets fetched. `allow_url` (e.g. a robots.txt check) filters
+# links and seeds before they enter the frontier; it runs on the event loop,
+# so it must not block. The start URL is always fetched.
+# With a `checkpoint` (crawl_store.CrawlCheckpoint), the seen-set and the
+# frontier are restored from the job's log, done pages are not fetched again,
+# and every queued URL and finished page is logged as the crawl goes.
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 8
+SEED_BATCH = 64
+
+
+def _take(iterator, count):
+    return [item for _, item in zip(range(count), iterator)]
+
+
+def _restore(checkpoint, start_url, key):
+    """(seen, frontier, pages already done) from a checkpoint; a new job starts at start_url."""
+    seen = UrlSet(key(url) for url in checkpoint.known_urls())
+    if not len(seen):
+        seen.add(key(start_url))
+        checkpoint.enqueue([(start_url, 0)])
+        return seen, deque([(start_url, 0)]), 0
+    return seen, deque(checkpoint.queued()), checkpoint.done_count()
+
+
+async def crawl(start_url, fetch_page, extract_links, max_pages=100, max_depth=2,
+                concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, parse_page=None, seed_urls=None,
+                allow_url=None, checkpoint=None, key=None):
+    """Crawl from start_url and yield (url, depth, result) as each page finishes."""
+    key = key or (lambda url: url)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="crawl")
+    host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    if checkpoint is not None:
+        seen, frontier, scheduled = await loop.run_in_executor(None, _restore, checkpoint, start_url, key)
+    else:
+        seen, frontier, scheduled = UrlSet([key(start_url)]), deque([(start_url, 0)]), 0
+    pending = set()
+    # Pages waiting on the parse stage no longer hold a connection, so fetching
+    # is counted separately; the overall cap bounds how many raw bodies queue up.
+    fetching = 0
+    max_in_flight = concurrency * 3 if parse_page is not None else concurrency
+    fetch_done = asyncio.Event()
+    seeds = iter(seed_urls) if seed_urls is not None else None
+
+    async def visit(url, depth):
+        nonlocal fetching
+        try:
+            async with host_slots[urlparse(url).netloc]:
+                result = await loop.run_in_executor(executor, fetch_page, url)
+        finally:
+            fetching -= 1
+            fetch_done.set()
+        if parse_page is not None:
+            result = parse_page(url, result)
+            if isinstance(result, Future):
+                result = await asyncio.wrap_future(result)
+        return url, depth, result
+
+    try:
+        while frontier or pending or seeds is not None:
+            if seeds is not None and len(frontier) < concurrency:
+                if len(seen) >= max_pages:
+                    seeds = None
+                else:
+                    batch = await loop.run_in_executor(None, _take, seeds, SEED_BATCH)
+                    if not batch:
+                        seeds = None
+                    queued = []
+                    for url in batch:
+                        if (len(seen) < max_pages and key(url) not in seen
+                                and (allow_url is None or allow_url(url))):
+                            seen.add(key(url))
+                            queued.append((url, 0))
+                    frontier.extend(queued)
+                    if checkpoint is not None:
+                        checkpoint.enqueue(queued)
+            fetch_done.clear()
+            while (frontier and fetching < concurrency and len(pending) < max_in_flight
+                   and scheduled < max_pages):
+                url, depth = frontier.popleft()
+                pending.add(asyncio.create_task(visit(url, depth)))
+                fetching += 1
+                scheduled += 1
+            if not pending:
+                if seeds is not None:
+                    continue
+                break
+
+            slot_freed = asyncio.ensure_future(fetch_done.wait())
+            done, _ = await asyncio.wait(pending | {slot_freed}, return_when=asyncio.FIRST_COMPLETED)
+            slot_freed.cancel()
+            done.discard(slot_freed)
+            pending -= done
+            for task in done:
+                url, depth, result = task.result()
+                queued = []
+                if depth < max_depth:
+                    for link in extract_links(url, result):
+                        if len(seen) >= max_pages:
+                            break
+                        if key(link) not in seen and (allow_url is None or allow_url(link)):
+                            seen.add(key(link))
+                            queued.append((link, depth + 1))
+                frontier.extend(queued)
+                if checkpoint is not None:
+                    checkpoint.finish(url, depth, result, queued)
+                yield url, depth, result
+    finally:
+        for task in pending:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def crawl_site(start_url, fetch_page, extract_links, on_result=None, **options):
+    """Run `crawl` to completion from synchronous code and return all results."""
+    async def run():
+        results = []
+        async for url, depth, result in crawl(start_url, fetch_page, extract_links, **options):
+            results.append(result)
+            if on_result:
+                on_result(url, depth, result)
+        return results
+
+    return asyncio.run(run())
@@ -0,0 +1,150 @@
+import parser_backends
+
+# --- Single-pass HTML signal extraction ---
+# One streaming walk over the document collects every signal the audit tabs
+# read, instead of a soup.find/find_all tree scan per check. The collector is a
+# parser target (start/end/data/close), so any backend in parser_backends can
+# drive it. Text nodes are joined as they are, so inline markup such as
+# Hello <b>W</b>orld keeps its words whole; block-level tags and <br> add
+# a line break.
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+SKIP_TEXT_TAGS = {'script', 'style'}
+SCRIPT_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'caption', 'dd', 'details', 'dialog', 'div', 'dl',
+    'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head', 'header',
+    'hr', 'li', 'main', 'nav', 'ol', 'option', 'p', 'pre', 'section', 'summary', 'table', 'td', 'th', 'title', 'tr',
+    'ul',
+}
+
+
+class SignalCollector:
+    def __init__(self):
+        self.title = None
+        self.meta_description = None
+        self.meta_robots = None
+        self.has_viewport = False
+        self.og_title = None
+        self.twitter_title = None
+        self.has_json_ld = False
+        self.canonical = None
+        self.favicon = None
+        self.headings = []
+        self.links = []
+        self.images = []
+        self.hreflang = []
+        self.assets = []            # (kind, url, render_blocking) for external scripts and stylesheets
+        self.text_parts = []
+
+        self._in_head = False
+        self._skip_depth = 0
+        self._title_parts = None
+        self._heading = None        # (level, parts) while inside <hN>
+        self._anchor = None         # (href, parts) while inside <a href>
+
+    def start(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.text_parts.append('\n')
+        if tag in SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+            script_type = (attrs.get('type') or '').strip().lower()
+            if tag == 'script' and script_type == 'application/ld+json':
+                self.has_json_ld = True
+            elif tag == 'script' and attrs.get('src') and script_type in SCRIPT_TYPES:
+                deferred = 'async' in attrs or 'defer' in attrs or script_type == 'module'
+                self.assets.append(('script', attrs['src'], self._in_head and not deferred))
+        elif tag == 'head':
+            self._in_head = True
+        elif tag == 'body':
+            self._in_head = False
+        elif tag == 'title':
+            if self.title is None and self._title_parts is None:
+                self._title_parts = []
+        elif tag in HEADING_TAGS:
+            self._heading = (HEADING_TAGS[tag], [])
+        elif tag == 'a':
+            self._close_anchor()
+            if attrs.get('href') is not None:
+                self._anchor = (attrs['href'], [])
+        elif tag == 'img':
+            self.images.append((attrs.get('src'), attrs.get('alt')))
+        elif tag == 'meta':
+            self._handle_meta(attrs)
+        elif tag == 'link':
+            self._handle_link(attrs)
+
+    def end(self, tag):
+        if tag in BLOCK_TAGS:
+            self.text_parts.append('\n')
+        if tag in SKIP_TEXT_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag == 'head':
+            self._in_head = False
+        elif tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+        elif tag in HEADING_TAGS and self._heading is not None:
+            level, parts = self._heading
+            self.headings.append((level, ''.join(parts).strip()))
+            self._heading = None
+        elif tag == 'a':
+            self._close_anchor()
+
+    def data(self, data):
+        if self._skip_depth:
+            return
+        self.text_parts.append(data)
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._heading is not None:
+            self._heading[1].append(data)
+        if self._anchor is not None:
+            self._anchor[1].append(data)
+
+    def close(self):
+        self.end('title')
+        if self._heading is not None:
+            self.end('h%d' % self._heading[0])
+        self._close_anchor()
+        return self
+
+    def _close_anchor(self):
+        if self._anchor is not None:
+            href, parts = self._anchor
+            self.links.append((href, ''.join(parts).strip()))
+            self._anchor = None
+
+    def _handle_meta(self, attrs):
+        name = (attrs.get('name') or '').strip().lower()
+        content = attrs.get('content')
+        if name == 'description' and self.meta_description is None:
+            self.meta_description = (content or '').strip()
+        elif name == 'robots' and self.meta_robots is None:
+            self.meta_robots = content or ''
+        elif name == 'viewport':
+            self.has_viewport = True
+        elif name == 'twitter:title' and self.twitter_title is None:
+            self.twitter_title = content or ''
+        elif (attrs.get('property') or '').strip().lower() == 'og:title' and self.og_title is None:
+            self.og_title = content or ''
+
+    def _handle_link(self, attrs):
+        rel = (attrs.get('rel') or '').lower().split()
+        if 'canonical' in rel and self.canonical is None:
+            self.canonical = attrs.get('href') or ''
+        if 'alternate' in rel and attrs.get('hreflang'):
+            self.hreflang.append((attrs['hreflang'], attrs.get('href')))
+        if any('icon' in value for value in rel) and self.favicon is None:
+            self.favicon = attrs.get('href') or ''
+        if 'stylesheet' in rel and attrs.get('href') and 'disabled' not in attrs:
+            media = (attrs.get('media') or 'all').strip().lower()
+            self.assets.append(('stylesheet', attrs['href'], self._in_head and media != 'print'))
+
+    @property
+    def text(self):
+        return ''.join(self.text_parts)
+
+
+def extract_signals(html, backend=None):
+    return parser_backends.get_backend(backend).run(html, SignalCollector())
@@ -0,0 +1,195 @@
+import codecs
+import email.utils
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import politeness
+
+# --- Shared HTTP connection pool ---
+# Every outbound request goes through one requests.Session so connections to a
+# host are kept alive and reused across pages and threads. urllib3's pools are
+# thread-safe; the session itself is built once under a lock. Callers that pace
+# and retry on HTTP status themselves (page downloads behind the politeness
+# gates, PSI calls against the API quota) use the second session, which only
+# retries connection and read errors.
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+DEFAULT_POOL_HOSTS = 32
+DEFAULT_POOL_SIZE = 16
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 4096
+PAGE_ATTEMPTS = 4
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+RETRY_POLICY = Retry(
+    total=3,
+    connect=3,
+    read=2,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(['GET', 'HEAD']),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+CONNECTION_RETRY_POLICY = RETRY_POLICY.new(status_forcelist=(), respect_retry_after_header=False)
+
+_sessions = {}
+_session_lock = threading.Lock()
+_host_pool_sizes = {}
+
+
+def _make_adapter(pool_size, retry):
+    return HTTPAdapter(
+        pool_connections=DEFAULT_POOL_HOSTS,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+
+
+def get_session(retry_status=True):
+    session = _sessions.get(retry_status)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(retry_status)
+            if session is None:
+                retry = RETRY_POLICY if retry_status else CONNECTION_RETRY_POLICY
+                session = requests.Session()
+                session.headers.update({'User-Agent': USER_AGENT, 'Connection': 'keep-alive'})
+                session.mount('http://', _make_adapter(DEFAULT_POOL_SIZE, retry))
+                session.mount('https://', _make_adapter(DEFAULT_POOL_SIZE, retry))
+                for host, size in _host_pool_sizes.items():
+                    _mount_host(session, host, size, retry)
+                _sessions[retry_status] = session
+    return session
+
+
+def _mount_host(session, host, pool_size, retry):
+    adapter = _make_adapter(pool_size, retry)
+    session.mount(f'http://{host}', adapter)
+    session.mount(f'https://{host}', adapter)
+
+
+def configure_host_pool(url_or_host, pool_size):
+    """Size the keep-alive pool for one host, e.g. to match the crawl's per-host cap."""
+    host = urlparse(url_or_host).netloc or url_or_host
+    with _session_lock:
+        if _host_pool_sizes.get(host) == pool_size:
+            return
+        _host_pool_sizes[host] = pool_size
+        for retry_status, session in _sessions.items():
+            _mount_host(session, host, pool_size, RETRY_POLICY if retry_status else CONNECTION_RETRY_POLICY)
+
+
+def fetch(url, timeout=20, **kwargs):
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+
+def head(url, timeout=10, **kwargs):
+    kwargs.setdefault('allow_redirects', True)
+    return get_session().head(url, timeout=timeout, **kwargs)
+
+
+# --- Streamed, size-capped page downloads ---
+
+class SkippedContent(requests.exceptions.RequestException):
+    """Raised when a response is not worth downloading (e.g. a PDF linked from a page)."""
+
+
+class Download:
+    __slots__ = ('url', 'status_code', 'headers', 'body', 'encoding', 'truncated')
+
+    def __init__(self, url, status_code, headers, body, encoding, truncated):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding
+        self.truncated = truncated
+
+
+def detect_charset(content_type, head):
+    """Charset from a BOM, the Content-Type header, or a <meta> tag in the first bytes."""
+    candidates = [name for bom, name in _BOMS if head.startswith(bom)]
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            candidates.append(value.strip().strip('"\''))
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    if match:
+        candidates.append(match.group(1).decode('ascii', errors='ignore'))
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+
+def retry_after(response):
+    """Seconds a Retry-After header asks to wait, or None."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def download_html(url, max_bytes=DEFAULT_MAX_BYTES, timeout=20, headers=None, throttle=None):
+    """Stream an HTML page, stopping at max_bytes and refusing other content types.
+
+    HTTP errors are raised as requests.HTTPError, so callers can read the status
+    code from the exception's response. A 304 to a conditional request comes back
+    with an empty body. The request holds a slot of the host's politeness gate
+    (politeness.default_throttle() unless another throttle is given), which
+    sees every answer; 429 and 5xx answers are retried after the gate's delay
+    or a backoff.
+    """
+    throttle = throttle or politeness.default_throttle()
+    for attempt in range(1, PAGE_ATTEMPTS + 1):
+        with throttle.slot(url):
+            response = get_session(retry_status=False).get(url, timeout=timeout, stream=True, headers=headers)
+            with response:
+                throttle.observe(url, response.status_code, response.elapsed.total_seconds(), retry_after(response))
+                if response.status_code not in RETRY_POLICY.status_forcelist or attempt == PAGE_ATTEMPTS:
+                    return _read_html(response, max_bytes)
+        if response.status_code not in politeness.THROTTLE_STATUSES:
+            time.sleep(RETRY_POLICY.backoff_factor * 2 ** attempt)
+
+
+def _read_html(response, max_bytes):
+    response.raise_for_status()
+    if response.status_code == 304:
+        return Download(response.url, 304, response.headers, b'', None, False)
+    content_type = response.headers.get('Content-Type', '')
+    mime = content_type.split(';')[0].strip().lower()
+    if mime and mime not in HTML_CONTENT_TYPES:
+        raise SkippedContent(f"Skipped non-HTML content ({mime}).", response=response)
+
+    chunks, size, truncated = [], 0, False
+    for chunk in response.iter_content(CHUNK_SIZE):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            truncated = True
+            break
+    body = b''.join(chunks)[:max_bytes]
+
+    return Download(response.url, response.status_code, response.headers, body,
+                    detect_charset(content_type, body[:SNIFF_BYTES]), truncated)
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import time
+
+from seo_checks import seo_checks
+from storage import CACHE_DIR, lazy_default, open_db
+from urls import STRIP_PARAMS, normalize_url
+
+# --- Incremental re-audit ---
+# The last crawl of each site is kept as (normalized url, content hash, check
+# statuses). On the next crawl, pages whose hash is unchanged reuse their
+# stored checks instead of being checked again, and the two crawls are diffed.
+# Skipping the parse of an unchanged page is not this module's job: the page
+# cache does that on every crawl, incremental or not (see fetch_page).
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    site TEXT NOT NULL,
+    url TEXT NOT NULL,
+    content_hash TEXT,
+    checks TEXT NOT NULL,
+    audited_at REAL NOT NULL,
+    PRIMARY KEY (site, url)
+)
+'''
+
+
+class SnapshotStore:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = open_db(path, _SCHEMA)
+
+    def load(self, site):
+        """Return {url: (content_hash, checks)} for the site's previous crawl."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, content_hash, checks FROM snapshots WHERE site = ?', (site,)
+            ).fetchall()
+        return {url: (content_hash, json.loads(checks)) for url, content_hash, checks in rows}
+
+    def save(self, site, snapshot):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM snapshots WHERE site = ?', (site,))
+            self._conn.executemany(
+                'INSERT INTO snapshots (site, url, content_hash, checks, audited_at) VALUES (?, ?, ?, ?, ?)',
+                [(site, url, content_hash, json.dumps(checks), now)
+                 for url, (content_hash, checks) in snapshot.items()],
+            )
+
+
+def build_snapshot(records, previous, strip_params=STRIP_PARAMS):
+    """Check statuses for every record by normalized URL, reusing the previous ones for unchanged pages.
+
+    Returns the snapshot and how many pages reused their checks.
+    """
+    snapshot, reused = {}, 0
+    for record in records:
+        key = normalize_url(record.url, strip_params)
+        old = previous.get(key)
+        if old is not None and record.content_hash and old[0] == record.content_hash:
+            snapshot[key] = old
+            reused += 1
+        else:
+            snapshot[key] = (record.content_hash, seo_checks(record))
+    return snapshot, reused
+
+
+def diff_snapshots(previous, current):
+    new = sorted(set(current) - set(previous))
+    removed = sorted(set(previous) - set(current))
+    changed, check_changes = [], []
+    for url in sorted(set(current) & set(previous)):
+        old_hash, old_checks = previous[url]
+        new_hash, new_checks = current[url]
+        if old_hash == new_hash:
+            continue
+        changed.append(url)
+        for check in sorted(set(old_checks) | set(new_checks)):
+            before, after = old_checks.get(check), new_checks.get(check)
+            if before != after:
+                check_changes.append({'url': url, 'check': check, 'before': before, 'after': after})
+    return {
+        'new': new,
+        'removed': removed,
+        'changed': changed,
+        'unchanged': len(set(current) & set(previous)) - len(changed),
+        'check_changes': check_changes,
+    }
+
+
+@lazy_default
+def default_store():
+    return SnapshotStore(os.path.join(CACHE_DIR, 'snapshots.sqlite'))
@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import zip_longest
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import requests
+
+import http_client
+import politeness
+from asset_inventory import page_assets
+from storage import CACHE_DIR, lazy_default, open_db
+from urls import STRIP_PARAMS, normalize_url
+
+# --- Site-wide broken-link check ---
+# Every <a href>, image, script and stylesheet URL of every crawled page is
+# collected and deduplicated before anything is requested: a 5k-page site
+# with a shared navigation has a few thousand unique targets, not 500k links.
+# Targets the crawl fetched itself take the crawl's status. Every other URL
+# gets one HEAD request (a GET when the server rejects HEAD), and the result
+# is kept in SQLite for LINK_MAX_AGE, or LINK_RETRY_AGE for failures that may
+# be temporary.
+# Checks are grouped by host into lanes: the audited site gets per_host lanes
+# behind its politeness gate, and every external host gets EXTERNAL_PER_HOST.
+# A lane works through its host's URLs one at a time, so a slow or throttling
+# host can hold its lanes' threads but no others.
+
+CHECK_WORKERS = 32
+CHECK_TIMEOUT = 10
+EXTERNAL_PER_HOST = 2
+LINK_MAX_AGE = 24 * 3600
+LINK_RETRY_AGE = 3600
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+HEAD_REJECTED = (405, 501)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS links (
+    url TEXT PRIMARY KEY,
+    status_code INTEGER,
+    final_url TEXT,
+    error TEXT,
+    checked_at REAL NOT NULL
+)
+'''
+_FIELDS = ('status_code', 'final_url', 'error')
+
+
+def page_link_targets(page):
+    """{absolute url: kind} for the page's links, images, scripts and stylesheets, without fragments."""
+    targets = {}
+    for href, _ in page.links:
+        try:
+            url = urldefrag(urljoin(page.base_url, href))[0]
+        except ValueError:  # unparsable, e.g. https://[domain]/x
+            continue
+        if url.startswith(('http://', 'https://')):
+            targets.setdefault(url, 'link')
+    for kind, url, _ in page_assets(page):
+        targets.setdefault(urldefrag(url)[0], kind)
+    return targets
+
+
+def is_broken(result):
+    """A failed request or a 4xx/5xx answer; 429 means the host is throttling us, not that the link is dead."""
+    if result['status_code'] is None:
+        return bool(result['error'])
+    return result['status_code'] >= 400 and result['status_code'] != 429
+
+
+def check_url(url, timeout=CHECK_TIMEOUT, throttle=None):
+    """{'status_code', 'final_url', 'error'} for one URL, from a HEAD or, if HEAD is refused, a GET."""
+    result = dict.fromkeys(_FIELDS)
+    try:
+        with throttle.slot(url) if throttle else nullcontext():
+            response = http_client.head(url, timeout=timeout)
+            if response.status_code in HEAD_REJECTED:
+                response = http_client.fetch(url, timeout=timeout, stream=True)
+                response.close()  # the status is all we need
+            if throttle:
+                throttle.observe(url, response.status_code, response.elapsed.total_seconds())
+        result['status_code'] = response.status_code
+        result['final_url'] = response.url if response.url != url else None
+    except requests.exceptions.RequestException as e:
+        result['error'] = str(e)
+    return result
+
+
+class LinkCache:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = open_db(path, _SCHEMA)
+
+    def get_many(self, urls, max_age=LINK_MAX_AGE, retry_age=LINK_RETRY_AGE):
+        """{url: result} for the urls checked recently enough: within max_age, or retry_age after a failure."""
+        found = {}
+        urls = list(urls)
+        now = time.time()
+        transient = ', '.join(str(status) for status in TRANSIENT_STATUSES)
+        with self._lock:
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT url, {', '.join(_FIELDS)} FROM links WHERE url IN ({', '.join('?' * len(chunk))}) "
+                    f"AND checked_at >= CASE WHEN error IS NULL AND status_code NOT IN ({transient}) "
+                    f"THEN ? ELSE ? END",
+                    (*chunk, now - max_age, now - retry_age),
+                ).fetchall()
+                found.update((row[0], dict(zip(_FIELDS, row[1:]))) for row in rows)
+        return found
+
+    def put_many(self, results):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO links (url, {', '.join(_FIELDS)}, checked_at) "
+                f"VALUES (?{', ?' * len(_FIELDS)}, ?)",
+                [(url, *(result[field] for field in _FIELDS), now) for url, result in results.items()],
+            )
+
+
+def check_links(urls, site_url=None, per_host=politeness.DEFAULT_MAXIMUM, workers=CHECK_WORKERS, cache=None,
+                on_checked=None):
+    """{url: result} for unique urls, requesting only those the cache does not hold.
+
+    URLs on site_url's host go through the shared politeness gate with per_host
+    lanes; every other host gets EXTERNAL_PER_HOST lanes. on_checked(url,
+    result) is called from the worker threads after each request.
+    """
+    cache = cache or default_cache()
+    urls = list(dict.fromkeys(urls))
+    results = cache.get_many(urls)
+    by_host = defaultdict(list)
+    for url in urls:
+        if url not in results:
+            by_host[urlsplit(url).netloc.lower()].append(url)
+    site = urlsplit(site_url).netloc.lower() if site_url else None
+    throttle = politeness.default_throttle()
+    checked = {}
+
+    def lane(host, pending):
+        gate = throttle if host == site else None
+        while pending:
+            try:
+                url = pending.pop()
+            except IndexError:  # another lane of the host took the last one
+                return
+            checked[url] = check_url(url, throttle=gate)
+            if on_checked:
+                on_checked(url, checked[url])
+
+    # Start every host's first lane before any host's second, so one host
+    # with many URLs does not fill the pool's queue ahead of the others.
+    lanes = [[(host, pending)] * min(per_host if host == site else EXTERNAL_PER_HOST, len(pending))
+             for host, pending in by_host.items()]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="link-check") as executor:
+        futures = [executor.submit(lane, *item) for batch in zip_longest(*lanes) for item in batch if item]
+        for future in futures:
+            future.result()
+    cache.put_many(checked)
+    results.update(checked)
+    return results
+
+
+def check_site_links(pages, site_url, per_host=politeness.DEFAULT_MAXIMUM, workers=CHECK_WORKERS, cache=None,
+                     strip_params=STRIP_PARAMS, allow_url=None, on_checked=None):
+    """(broken, stats) for the crawled pages' links.
+
+    broken has one row per source page and broken target; stats counts the
+    links found, the unique targets, and how many of those the crawl already
+    answered or needed a request. Targets allow_url rejects (e.g. disallowed
+    by robots.txt) are not checked.
+    """
+    crawled = {}
+    for page in pages:
+        crawled.setdefault(normalize_url(page.url, strip_params), page)
+    sources, unique = [], {}
+    for page in pages:
+        if page.error:
+            continue
+        targets = page_link_targets(page)
+        sources.append((page.url, targets))
+        unique.update(dict.fromkeys(targets))
+
+    results, to_check, skipped = {}, [], 0
+    for url in unique:
+        page = crawled.get(normalize_url(url, strip_params))
+        if page is None and allow_url is not None and not allow_url(url):
+            results[url] = dict.fromkeys(_FIELDS)
+            skipped += 1
+        elif page is None:
+            to_check.append(url)
+        else:
+            results[url] = {'status_code': page.status_code, 'final_url': None,
+                            'error': page.error if page.status_code is None else None}
+    requested = []
+
+    def counted(url, result):
+        requested.append(url)
+        if on_checked:
+            on_checked(url, result)
+
+    results.update(check_links(to_check, site_url, per_host, workers, cache, counted))
+
+    broken = [{'source': source, 'url': url, 'kind': kind, **results[url]}
+              for source, targets in sources for url, kind in targets.items() if is_broken(results[url])]
+    stats = {
+        'pages': len(sources),
+        'links': sum(len(targets) for _, targets in sources),
+        'unique': len(unique),
+        'from_crawl': len(unique) - len(to_check) - skipped,
+        'skipped': skipped,
+        'requested': len(requested),
+        'broken': sum(1 for result in results.values() if is_broken(result)),
+    }
+    return broken, stats
+
+
+@lazy_default
+def default_cache():
+    return LinkCache(os.path.join(CACHE_DIR, 'links.sqlite'))
@@ -0,0 +1,91 @@
+import os
+import pickle
+import threading
+import time
+import zlib
+
+from storage import CACHE_DIR, lazy_default, open_db
+
+# --- Persistent page cache ---
+# Audited pages survive restarts in a SQLite file. Each row holds the
+# compressed PageRecord (body included) and its ETag / Last-Modified
+# validators, so a revisit can be a conditional GET and a 304 reuses the record.
+# A 200 whose body hashes the same as the cached one also reuses the record
+# without parsing again; this holds for every crawl, not only incremental ones.
+# Pages not fetched or revalidated within PAGE_RETENTION are dropped, and past
+# PAGE_CACHE_MAX_BYTES the least recently validated go first; the cache is
+# pruned when it is opened and after every PRUNE_EVERY writes.
+
+PAGE_RETENTION = 30 * 24 * 3600
+PAGE_CACHE_MAX_BYTES = 1024 ** 3
+PRUNE_EVERY = 1000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    validated_at REAL NOT NULL,
+    record BLOB NOT NULL
+)
+'''
+
+
+class PageCache:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = open_db(path, _SCHEMA)
+        self._writes = 0
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute('SELECT record FROM pages WHERE url = ?', (url,)).fetchone()
+        return pickle.loads(zlib.decompress(row[0])) if row else None
+
+    def put(self, record):
+        now = time.time()
+        blob = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages (url, etag, last_modified, fetched_at, validated_at, record) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (record.url, record.headers.get('etag'), record.headers.get('last-modified'), now, now, blob),
+            )
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def touch(self, url):
+        """Mark a cached page as revalidated (the server answered 304)."""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE pages SET validated_at = ? WHERE url = ?', (time.time(), url))
+
+    def prune(self, max_age=PAGE_RETENTION, max_bytes=PAGE_CACHE_MAX_BYTES):
+        """Drop pages not validated for max_age seconds, then the least recently validated beyond max_bytes."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM pages WHERE validated_at < ?', (time.time() - max_age,))
+            self._conn.execute(
+                'DELETE FROM pages WHERE url IN (SELECT url FROM ('
+                'SELECT url, SUM(LENGTH(record)) OVER (ORDER BY validated_at DESC, url) AS kept FROM pages'
+                ') WHERE kept > ?)',
+                (max_bytes,),
+            )
+
+
+def conditional_headers(record):
+    headers = {}
+    if record is not None:
+        if record.headers.get('etag'):
+            headers['If-None-Match'] = record.headers['etag']
+        if record.headers.get('last-modified'):
+            headers['If-Modified-Since'] = record.headers['last-modified']
+    return headers
+
+
+@lazy_default
+def default_cache():
+    cache = PageCache(os.path.join(CACHE_DIR, 'pages.sqlite'))
+    cache.prune()
+    return cache
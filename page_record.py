@@ -0,0 +1,102 @@
+import hashlib
+
+from html_extract import extract_signals
+
+# --- Compact per-page audit record ---
+# audit_page results are cached by st.cache_data, which pickles and copies them
+# on every hit. A PageRecord keeps only the extracted signals plus the raw body.
+
+KEPT_HEADERS = ('content-type', 'content-length', 'last-modified', 'etag', 'cache-control', 'x-robots-tag', 'server')
+
+
+class PageRecord:
+    __slots__ = (
+        'url', 'final_url', 'status_code', 'error', 'headers', 'body', 'encoding', 'truncated', 'content_hash',
+        'title', 'meta_description', 'meta_robots', 'has_viewport', 'og_title', 'twitter_title',
+        'has_json_ld', 'headings', 'links', 'images', 'assets', 'canonical', 'hreflang', 'favicon', 'text', 'keywords',
+    )
+
+    def __init__(self, url, status_code=None, error=None, headers=None, body=b'', encoding='utf-8', truncated=False,
+                 title='', meta_description='', meta_robots=None, has_viewport=False, og_title=None,
+                 twitter_title=None, has_json_ld=False, headings=(), links=(), images=(), assets=(), canonical=None,
+                 hreflang=(), favicon=None, text='', content_hash=None, keywords=None, final_url=None):
+        self.url = url
+        self.final_url = final_url  # where the page was served from after redirects, when it differs
+        self.status_code = status_code
+        self.error = error
+        self.headers = headers or {}
+        self.body = body
+        self.encoding = encoding
+        self.truncated = truncated  # body was cut at the download size cap
+        self.content_hash = content_hash
+        self.title = title
+        self.meta_description = meta_description
+        self.meta_robots = meta_robots
+        self.has_viewport = has_viewport
+        self.og_title = og_title
+        self.twitter_title = twitter_title
+        self.has_json_ld = has_json_ld
+        self.headings = headings    # ((level, text), ...)
+        self.links = links          # ((href, anchor_text), ...)
+        self.images = images        # ((src, alt or None), ...)
+        self.assets = assets        # ((kind, url, render_blocking), ...) for scripts and stylesheets
+        self.canonical = canonical
+        self.hreflang = hreflang    # ((lang, href), ...)
+        self.favicon = favicon
+        self.text = text            # visible text, scripts and styles excluded
+        self.keywords = keywords    # top keyword suggestions, filled in by the parse stage
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        self.__init__(state['url'])  # defaults for slots added since the record was stored
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def html(self):
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+    @property
+    def base_url(self):
+        """The URL the page's relative links resolve against."""
+        return self.final_url or self.url
+
+    @property
+    def h1_tags(self):
+        return [text for level, text in self.headings if level == 1]
+
+
+def content_hash(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+def kept_headers(headers):
+    return {name: headers[name] for name in KEPT_HEADERS if name in headers}
+
+
+def extract_record(url, status_code, headers, body, encoding, truncated=False, final_url=None):
+    """Walk a fetched page once and keep only what the audit reads."""
+    record = PageRecord(
+        url, status_code=status_code, body=body, encoding=encoding, truncated=truncated,
+        headers=kept_headers(headers), content_hash=content_hash(body),
+        final_url=final_url if final_url != url else None,
+    )
+    signals = extract_signals(record.html)
+    record.title = signals.title or ""
+    record.meta_description = signals.meta_description or ""
+    record.meta_robots = signals.meta_robots
+    record.has_viewport = signals.has_viewport
+    record.og_title = signals.og_title
+    record.twitter_title = signals.twitter_title
+    record.has_json_ld = signals.has_json_ld
+    record.headings = tuple(signals.headings)
+    record.links = tuple(signals.links)
+    record.images = tuple(signals.images)
+    record.assets = tuple(signals.assets)
+    record.canonical = signals.canonical
+    record.hreflang = tuple(signals.hreflang)
+    record.favicon = signals.favicon
+    record.text = signals.text
+    return record
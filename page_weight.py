@@ -0,0 +1,44 @@
+from asset_inventory import PROBE_WORKERS, asset_metadata, page_assets
+
+# --- Static page-weight analysis ---
+# A PageSpeed Insights stand-in for when there is no API key or the quota is
+# spent. It works from the already-fetched HTML: external scripts and
+# stylesheets (render-blocking when in <head> and not async/defer/print) plus
+# images, sized through the asset inventory's probes and cache. The findings
+# use the PSI opportunity shape, so the Performance tab renders them with the
+# same tables.
+
+
+def analyze_page_weight(page, workers=PROBE_WORKERS):
+    resources = page_assets(page)
+    metas = asset_metadata([url for _, url, _ in resources], workers)
+    sizes = [metas[url]['size'] for _, url, _ in resources]
+
+    items = [{'url': page.url, 'kind': 'document', 'totalBytes': len(page.body)}]
+    items += [{'url': url, 'kind': kind, 'totalBytes': size}
+              for (kind, url, _), size in zip(resources, sizes)]
+    blocking = [{'url': url, 'kind': kind, 'totalBytes': size}
+                for (kind, url, render_blocking), size in zip(resources, sizes) if render_blocking]
+    total_bytes = sum(item['totalBytes'] or 0 for item in items)
+    items.sort(key=lambda item: item['totalBytes'] or 0, reverse=True)
+
+    opportunities = {'total-byte-weight': {
+        'displayValue': f"Total size was {total_bytes / 1024:,.0f} KiB",
+        'description': "Sizes from HEAD/Range requests for the HTML, scripts, stylesheets and images the page "
+                       "references. Fonts and resources loaded by scripts or CSS are not included.",
+        'items': items,
+    }}
+    if blocking:
+        opportunities['render-blocking-resources'] = {
+            'displayValue': f"{len(blocking)} resources",
+            'description': "Scripts without async/defer and stylesheets in <head> block the first paint "
+                           "until they are downloaded.",
+            'items': blocking,
+        }
+    return {
+        'total_bytes': total_bytes,
+        'request_count': len(items),
+        'unknown_sizes': sum(size is None for size in sizes),
+        'render_blocking_count': len(blocking),
+        'opportunities': opportunities,
+    }
@@ -0,0 +1,130 @@
+import importlib.util
+from html.parser import HTMLParser
+
+# --- Pluggable HTML parser backends ---
+# Each backend drives a parser target (an object with start/end/data/close
+# methods) over a document and returns target.close(). Backends whose library is
+# not installed are skipped. PREFERRED_ORDER is fastest first, as measured by
+# bench_parsers.py; get_backend() picks the first one that is available.
+
+PREFERRED_ORDER = ('lxml', 'selectolax', 'html.parser', 'html5lib')
+
+
+class ParserBackend:
+    name = None
+    module = None  # import needed for the backend to be available
+
+    @classmethod
+    def available(cls):
+        return cls.module is None or importlib.util.find_spec(cls.module) is not None
+
+    def run(self, html, target):
+        raise NotImplementedError
+
+
+class _StdlibDriver(HTMLParser):
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+class StdlibBackend(ParserBackend):
+    name = 'html.parser'
+
+    def run(self, html, target):
+        driver = _StdlibDriver(target)
+        driver.feed(html)
+        driver.close()
+        return target.close()
+
+
+class LxmlBackend(ParserBackend):
+    name = 'lxml'
+    module = 'lxml'
+
+    def run(self, html, target):
+        from lxml import etree
+        parser = etree.HTMLParser(target=target)
+        parser.feed(html)
+        return parser.close()
+
+
+class SelectolaxBackend(ParserBackend):
+    name = 'selectolax'
+    module = 'selectolax'
+
+    def run(self, html, target):
+        from selectolax.lexbor import LexborHTMLParser
+        root = LexborHTMLParser(html).root
+        if root is None:
+            return target.close()
+
+        # Iterative pre-order walk that emits an end event after each element's children.
+        stack = [(root, False)]
+        while stack:
+            node, leaving = stack.pop()
+            tag = node.tag
+            if leaving:
+                target.end(tag)
+            elif tag == '-text':
+                target.data(node.text(deep=False))
+            elif not tag.startswith('-'):
+                target.start(tag, node.attributes)
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(list(node.iter(include_text=True))))
+        return target.close()
+
+
+class Html5libBackend(ParserBackend):
+    name = 'html5lib'
+    module = 'html5lib'
+
+    def run(self, html, target):
+        import html5lib
+        walker = html5lib.getTreeWalker('etree')
+        for token in walker(html5lib.parse(html)):
+            kind = token['type']
+            if kind in ('StartTag', 'EmptyTag'):
+                target.start(token['name'], {name: value for (_, name), value in token['data'].items()})
+                if kind == 'EmptyTag':
+                    target.end(token['name'])
+            elif kind == 'EndTag':
+                target.end(token['name'])
+            elif kind in ('Characters', 'SpaceCharacters'):
+                target.data(token['data'])
+        return target.close()
+
+
+BACKENDS = {backend.name: backend for backend in (LxmlBackend, SelectolaxBackend, StdlibBackend, Html5libBackend)}
+
+_instances = {}
+
+
+def available_backends():
+    return [name for name in PREFERRED_ORDER if BACKENDS[name].available()]
+
+
+def get_backend(name=None):
+    """Return the named backend, or the fastest installed one when name is None."""
+    if name is None:
+        name = available_backends()[0]
+    elif name not in BACKENDS:
+        raise ValueError(f"Unknown parser backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    elif not BACKENDS[name].available():
+        raise ValueError(f"Parser backend '{name}' is not installed.")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
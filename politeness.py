@@ -0,0 +1,140 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from storage import lazy_default
+
+# --- Adaptive per-host politeness ---
+# Every page download takes a slot from its host's gate. A gate allows `limit`
+# requests in flight and controls it AIMD-style, like TCP congestion control:
+# each answer with a flat time to first byte adds 1/limit (about +1 per round
+# of requests). A 429 or 503, or a smoothed TTFB well above the best seen for
+# the host, halves the limit, at most once per round. Retry-After and the
+# robots.txt Crawl-delay push back the earliest time the next request may
+# start. A fast CDN climbs towards its maximum within a few rounds, while a
+# struggling host settles at one or two connections. Gates are shared by all
+# crawls in the process, so two audits of one site never add up their limits.
+
+DEFAULT_INITIAL = 2
+DEFAULT_MAXIMUM = 8
+MIN_LIMIT = 1
+THROTTLE_STATUSES = (429, 503)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+TTFB_SMOOTHING = 0.2   # weight of a new sample in the TTFB moving average
+TTFB_RISE = 2.0        # congestion once the average passes this multiple of the best average
+TTFB_SLACK = 0.05      # ... plus this many seconds, so millisecond jitter on fast hosts is ignored
+
+
+class HostGate:
+    """AIMD concurrency limit and request pacing for one host."""
+
+    def __init__(self, initial=DEFAULT_INITIAL, maximum=DEFAULT_MAXIMUM, crawl_delay=None):
+        self.maximum = maximum
+        self.limit = float(min(initial, maximum))
+        self.crawl_delay = crawl_delay
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.ttfb = None       # moving average, seconds
+        self.best_ttfb = None
+        self.throttled = 0     # 429/503 answers seen
+        self._since_decrease = float('inf')  # answers since the last decrease; the first signal always counts
+
+    def _decrease(self):
+        if self._since_decrease >= self.limit:
+            self.limit = max(MIN_LIMIT, self.limit / 2)
+            self._since_decrease = 0
+
+    def observe(self, status_code, ttfb=None, retry_after=None):
+        """Adjust the limit after an answer; a throttled answer also delays the next request."""
+        now = time.monotonic()
+        self._since_decrease += 1
+        if status_code in THROTTLE_STATUSES:
+            self.throttled += 1
+            self._decrease()
+            # Retry-After is capped: a server asking for a day would otherwise
+            # hold every crawl thread waiting on this host for that long.
+            wait = min(retry_after, BACKOFF_MAX) if retry_after is not None else random.uniform(
+                0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** min(self.throttled, 16)))
+            self.next_start = max(self.next_start, now + wait)
+            return
+        if ttfb is not None:
+            self.ttfb = ttfb if self.ttfb is None else self.ttfb + TTFB_SMOOTHING * (ttfb - self.ttfb)
+            self.best_ttfb = self.ttfb if self.best_ttfb is None else min(self.best_ttfb, self.ttfb)
+            if self.ttfb > self.best_ttfb * TTFB_RISE + TTFB_SLACK:
+                self._decrease()
+                return
+        if status_code is not None and status_code < 500:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+class HostThrottle:
+    def __init__(self, initial=DEFAULT_INITIAL, maximum=DEFAULT_MAXIMUM):
+        self.initial = initial
+        self.maximum = maximum
+        self._gates = {}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _host(url):
+        try:
+            return urlsplit(url).netloc.lower()
+        except ValueError:  # e.g. http://[::1; the request itself then fails with InvalidURL
+            return ''
+
+    def _gate(self, host):
+        gate = self._gates.get(host)
+        if gate is None:
+            gate = self._gates[host] = HostGate(self.initial, self.maximum)
+        return gate
+
+    def configure(self, url, initial=None, maximum=None, crawl_delay=None):
+        """Set a host's starting limit, its ceiling and its robots.txt Crawl-delay."""
+        with self._cond:
+            gate = self._gate(self._host(url))
+            if maximum is not None:
+                gate.maximum = maximum
+            if initial is not None and gate.in_flight == 0:
+                gate.limit = float(initial)
+            gate.limit = min(gate.limit, gate.maximum)
+            gate.crawl_delay = crawl_delay
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url):
+        """Hold one of the host's request slots, waiting for a free one and for its pacing."""
+        host = self._host(url)
+        with self._cond:
+            gate = self._gate(host)
+            while True:
+                now = time.monotonic()
+                if gate.in_flight < int(gate.limit) and now >= gate.next_start:
+                    break
+                self._cond.wait(max(0.0, gate.next_start - now) or None)
+            gate.in_flight += 1
+            if gate.crawl_delay:
+                gate.next_start = max(gate.next_start, now + gate.crawl_delay)
+        try:
+            yield
+        finally:
+            with self._cond:
+                gate.in_flight -= 1
+                self._cond.notify_all()
+
+    def observe(self, url, status_code, ttfb=None, retry_after=None):
+        with self._cond:
+            self._gate(self._host(url)).observe(status_code, ttfb, retry_after)
+            self._cond.notify_all()
+
+    def stats(self):
+        """{host: (limit, in flight, TTFB average, throttled answers)} for every host seen."""
+        with self._cond:
+            return {host: (int(gate.limit), gate.in_flight, gate.ttfb, gate.throttled)
+                    for host, gate in self._gates.items()}
+
+
+@lazy_default
+def default_throttle():
+    return HostThrottle()
@@ -0,0 +1,108 @@
+import os
+import statistics
+import threading
+import time
+
+from psi_report import PSI_CATEGORIES
+from storage import CACHE_DIR, lazy_default, open_db
+from urls import normalize_url
+
+# --- PageSpeed Insights history ---
+# Every PSI result is appended to a SQLite time series keyed by
+# (url, strategy, run time). The table is clustered on that key, so a range
+# query for one URL and strategy reads a single contiguous run of rows;
+# downsampling averages the rows of each time bucket in SQL.
+
+HISTORY_COLUMNS = {
+    'Performance': 'performance', 'Accessibility': 'accessibility', 'SEO': 'seo', 'Best Practices': 'best_practices',
+    'First Contentful Paint': 'fcp_ms', 'Largest Contentful Paint': 'lcp_ms', 'Total Blocking Time': 'tbt_ms',
+    'Cumulative Layout Shift': 'cls', 'Speed Index': 'speed_index_ms',
+}
+SCORE_LABELS = tuple(PSI_CATEGORIES)
+
+# A run regresses when a score falls this many points below the baseline, or
+# a lab metric (lower is better) rises this far above it.
+SCORE_DROP = 5
+METRIC_RISE = 0.10
+BASELINE_RUNS = 5
+
+_SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS psi_runs (
+    url TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    run_at REAL NOT NULL,
+    {', '.join(f'{column} REAL' for column in HISTORY_COLUMNS.values())},
+    PRIMARY KEY (url, strategy, run_at)
+) WITHOUT ROWID
+'''
+
+
+class PsiHistory:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = open_db(path, _SCHEMA)
+
+    def record(self, url, report, run_at=None):
+        values = {**report.scores, **report.metric_values}
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO psi_runs (url, strategy, run_at, {', '.join(HISTORY_COLUMNS.values())}) "
+                f"VALUES (?, ?, ?{', ?' * len(HISTORY_COLUMNS)})",
+                (normalize_url(url), report.strategy, run_at or time.time(),
+                 *(values.get(label) for label in HISTORY_COLUMNS)),
+            )
+
+    def series(self, url, strategy, since=None, until=None, bucket=None):
+        """Runs in [since, until] as dicts, oldest first.
+
+        With bucket (seconds), runs in each bucket are averaged into one point
+        stamped with the bucket's first run.
+        """
+        columns = list(HISTORY_COLUMNS.values())
+        if bucket:
+            select = ', '.join(['MIN(run_at)'] + [f'AVG({column})' for column in columns])
+            group = f'GROUP BY CAST(run_at / {float(bucket)} AS INTEGER)'
+        else:
+            select, group = ', '.join(['run_at'] + columns), ''
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {select} FROM psi_runs WHERE url = ? AND strategy = ? AND run_at BETWEEN ? AND ? '
+                f'{group} ORDER BY 1',
+                (normalize_url(url), strategy, since or 0, until or float('inf')),
+            ).fetchall()
+        return [dict(zip(['run_at', *HISTORY_COLUMNS], row)) for row in rows]
+
+    def latest(self, url, strategy, runs):
+        """The most recent `runs` runs, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT run_at, {', '.join(HISTORY_COLUMNS.values())} FROM psi_runs "
+                'WHERE url = ? AND strategy = ? ORDER BY run_at DESC LIMIT ?',
+                (normalize_url(url), strategy, runs),
+            ).fetchall()
+        return [dict(zip(['run_at', *HISTORY_COLUMNS], row)) for row in rows]
+
+    def regressions(self, url, strategy, baseline_runs=BASELINE_RUNS):
+        """[(label, baseline, latest)] where the latest run is worse than the median of the runs before it."""
+        runs = self.latest(url, strategy, baseline_runs + 1)
+        if len(runs) < 2:
+            return []
+        current, previous = runs[0], runs[1:]
+        found = []
+        for label in HISTORY_COLUMNS:
+            values = [run[label] for run in previous if run[label] is not None]
+            if current[label] is None or not values:
+                continue
+            baseline = statistics.median(values)
+            if label in SCORE_LABELS:
+                worse = current[label] <= baseline - SCORE_DROP
+            else:
+                worse = current[label] > baseline * (1 + METRIC_RISE)
+            if worse:
+                found.append((label, baseline, current[label]))
+        return found
+
+
+@lazy_default
+def default_history():
+    return PsiHistory(os.path.join(CACHE_DIR, 'psi_history.sqlite'))
@@ -0,0 +1,97 @@
+import base64
+import binascii
+import json
+import zlib
+
+# --- Slim PageSpeed Insights report ---
+# A raw PSI response runs to several MB: the base64 final screenshot, the
+# screenshot-thumbnails filmstrip, the full-page screenshot and hundreds of
+# audits the apps never show. A PsiReport keeps the category scores, the lab
+# metrics, the final screenshot as raw image bytes and the opportunity audits
+# the Performance tab lists. The opportunities stay zlib-compressed until shown.
+
+PSI_CATEGORIES = {
+    'Performance': 'performance', 'Accessibility': 'accessibility', 'SEO': 'seo', 'Best Practices': 'best-practices',
+}
+PSI_METRICS = {
+    'First Contentful Paint': 'first-contentful-paint', 'Largest Contentful Paint': 'largest-contentful-paint',
+    'Total Blocking Time': 'total-blocking-time', 'Cumulative Layout Shift': 'cumulative-layout-shift',
+    'Speed Index': 'speed-index',
+}
+OPPORTUNITY_AUDITS = (
+    ('render-blocking-resources', "Eliminate Render-Blocking Resources", ('url', 'totalBytes', 'wastedMs')),
+    ('uses-optimized-images', "Properly Size Images", ('url', 'totalBytes', 'wastedBytes')),
+    ('uses-next-gen-images', "Serve Images in Next-Gen Formats", ('url', 'totalBytes', 'wastedBytes')),
+    ('unused-javascript', "Reduce Unused JavaScript", ('url', 'totalBytes', 'wastedBytes')),
+    ('unused-css-rules', "Reduce Unused CSS", ('url', 'totalBytes', 'wastedBytes')),
+    ('total-byte-weight', "Avoid Enormous Network Payloads", ('url', 'kind', 'totalBytes')),
+)
+
+
+class PsiReport:
+    __slots__ = ('url', 'strategy', 'scores', 'metrics', 'metric_values', 'screenshot', '_opportunities')
+
+    def __init__(self, url, strategy='mobile', scores=None, metrics=None, metric_values=None, screenshot=None,
+                 opportunities=None):
+        self.url = url
+        self.strategy = strategy
+        self.scores = scores or dict.fromkeys(PSI_CATEGORIES)  # {label: 0-100 or None}
+        self.metrics = metrics or dict.fromkeys(PSI_METRICS)   # {label: display value, e.g. '2.1 s'}
+        self.metric_values = metric_values or dict.fromkeys(PSI_METRICS)  # {label: ms, or unitless for CLS}
+        self.screenshot = screenshot                           # final screenshot as image bytes
+        self._opportunities = zlib.compress(json.dumps(opportunities or {}).encode())
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        self.__init__(state['url'])
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def opportunities(self):
+        """{audit_id: {'displayValue', 'description', 'items'}} for audits with findings."""
+        return json.loads(zlib.decompress(self._opportunities))
+
+    @property
+    def has_performance(self):
+        return self.scores.get('Performance') is not None
+
+
+def _decode_data_url(data_url):
+    if not data_url or ',' not in data_url:
+        return None
+    try:
+        return base64.b64decode(data_url.split(',', 1)[1])
+    except (binascii.Error, ValueError):
+        return None
+
+
+def slim_report(data, strategy='mobile'):
+    """Project a raw PSI response onto a PsiReport."""
+    lighthouse = data.get('lighthouseResult', {})
+    categories = lighthouse.get('categories', {})
+    audits = lighthouse.get('audits', {})
+
+    scores = {}
+    for label, category_id in PSI_CATEGORIES.items():
+        score = categories.get(category_id, {}).get('score')
+        scores[label] = score * 100 if score is not None else None
+    metrics = {label: audits.get(audit_id, {}).get('displayValue') for label, audit_id in PSI_METRICS.items()}
+    metric_values = {label: audits.get(audit_id, {}).get('numericValue') for label, audit_id in PSI_METRICS.items()}
+
+    opportunities = {}
+    for audit_id, _, columns in OPPORTUNITY_AUDITS:
+        audit = audits.get(audit_id, {})
+        items = audit.get('details', {}).get('items')
+        if items:
+            opportunities[audit_id] = {
+                'displayValue': audit.get('displayValue', ''),
+                'description': audit.get('description'),
+                'items': [{column: item[column] for column in columns if column in item} for item in items],
+            }
+
+    screenshot = _decode_data_url(audits.get('final-screenshot', {}).get('details', {}).get('data'))
+    return PsiReport(data.get('id') or lighthouse.get('finalUrl'), strategy, scores, metrics, metric_values, screenshot,
+                     opportunities)
@@ -0,0 +1,282 @@
+import argparse
+import datetime
+import json
+import os
+import pickle
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import audit_core
+import http_client
+from psi_report import PSI_CATEGORIES
+from storage import CACHE_DIR, lazy_default, open_db
+from urls import normalize_url
+
+# --- Quota-aware PageSpeed Insights batches ---
+# Usage:
+#   python psi_scheduler.py example-crawl urls.txt --strategy mobile desktop
+#   python psi_scheduler.py example-crawl --output results.jsonl   (resume, then export)
+# Every (url, strategy) pair of a batch is a row in SQLite, so a batch larger
+# than the daily quota simply stops when the quota is spent and carries on
+# from the pending rows on the next run. Calls are paced by a token bucket
+# (per-second quota) and a per-day counter; 429 and 5xx answers and network
+# errors are retried with jittered exponential backoff; any other failure,
+# such as a malformed response, marks the row failed. WEB_AUDIT_PSI_ENDPOINT
+# or --endpoint points the scheduler at a local stub server.
+
+DEFAULT_PER_SECOND = 4
+DEFAULT_PER_DAY = 25000
+DEFAULT_WORKERS = 4
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS psi_jobs (
+    batch TEXT NOT NULL,
+    url TEXT NOT NULL,
+    request_url TEXT,
+    strategy TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result BLOB,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (batch, url, strategy)
+);
+CREATE TABLE IF NOT EXISTS psi_usage (
+    day TEXT PRIMARY KEY,
+    requests INTEGER NOT NULL
+);
+'''
+
+
+def quota_day():
+    """The current quota day; the PSI quota resets at midnight Pacific time."""
+    try:
+        from zoneinfo import ZoneInfo
+        return datetime.datetime.now(ZoneInfo('America/Los_Angeles')).date().isoformat()
+    except Exception:
+        return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PsiQueue:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = open_db(path, _SCHEMA)
+        with self._lock, self._conn:
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(psi_jobs)')}
+            if 'request_url' not in columns:  # a queue created before request_url was stored
+                self._conn.execute('ALTER TABLE psi_jobs ADD COLUMN request_url TEXT')
+
+    def enqueue(self, batch, urls, strategies, max_age=None):
+        """Queue every (url, strategy) pair once; return the queued URLs, one per page.
+
+        Rows are keyed by the normalized URL, but PSI is called with the URL
+        as first queued: a normalized /a may only be a redirect to the real /a/.
+        Finished rows are kept, so re-queueing resumes a batch. With max_age,
+        rows finished more than max_age seconds ago are queued again.
+        """
+        unique = {}
+        for url in urls:
+            unique.setdefault(normalize_url(url), url)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO psi_jobs (batch, url, request_url, strategy, status, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?)",
+                [(batch, key, url, strategy, now) for key, url in unique.items() for strategy in strategies],
+            )
+            if max_age is not None:
+                self._conn.execute(
+                    "UPDATE psi_jobs SET status = 'pending', attempts = 0 WHERE batch = ? AND status != 'pending' "
+                    "AND updated_at < ?", (batch, now - max_age),
+                )
+        return list(unique.values())
+
+    def pending(self, batch):
+        """[(key, url to request, strategy, attempts)] still to run."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT url, COALESCE(request_url, url), strategy, attempts FROM psi_jobs "
+                "WHERE batch = ? AND status = 'pending' ORDER BY rowid", (batch,),
+            ).fetchall()
+
+    def finish(self, batch, url, strategy, attempts, result=None, error=None):
+        blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL) if result is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE psi_jobs SET status = ?, attempts = ?, result = ?, error = ?, updated_at = ? '
+                'WHERE batch = ? AND url = ? AND strategy = ?',
+                ('failed' if error else 'done', attempts, blob, error, time.time(), batch, url, strategy),
+            )
+
+    def progress(self, batch):
+        """{'pending': n, 'done': n, 'failed': n} for the batch."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT status, COUNT(*) FROM psi_jobs WHERE batch = ? GROUP BY status', (batch,)
+            ).fetchall()
+        return {'pending': 0, 'done': 0, 'failed': 0, **dict(rows)}
+
+    def results(self, batch, urls=None):
+        """Yield (url, strategy, PsiReport or None, error) for finished rows, optionally only for some URLs.
+
+        With urls, each row comes back under the caller's spelling of its URL.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, COALESCE(request_url, url), strategy, result, error FROM psi_jobs "
+                "WHERE batch = ? AND status != 'pending' ORDER BY rowid", (batch,),
+            ).fetchall()
+        wanted = {normalize_url(url): url for url in urls} if urls is not None else None
+        for key, url, strategy, blob, error in rows:
+            if wanted is None or key in wanted:
+                yield wanted[key] if wanted is not None else url, strategy, pickle.loads(blob) if blob else None, error
+
+    def take_quota(self, day, per_day):
+        """Count one request against the day's quota; False once it is spent."""
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT requests FROM psi_usage WHERE day = ?', (day,)).fetchone()
+            used = row[0] if row else 0
+            if used >= per_day:
+                return False
+            self._conn.execute('INSERT OR REPLACE INTO psi_usage (day, requests) VALUES (?, ?)', (day, used + 1))
+            return True
+
+
+class PsiScheduler:
+    def __init__(self, api_key, queue, per_second=DEFAULT_PER_SECOND, per_day=DEFAULT_PER_DAY,
+                 workers=DEFAULT_WORKERS, max_attempts=MAX_ATTEMPTS, endpoint=None):
+        self.api_key = api_key
+        self.queue = queue
+        self.per_day = per_day
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.endpoint = endpoint
+        self._bucket = TokenBucket(per_second)
+        self._quota_spent = threading.Event()
+
+    def _backoff(self, attempt, response):
+        # Full jitter: spread retries of concurrent workers over the whole window.
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        return max(delay, http_client.retry_after(response) or 0)
+
+    def _run_one(self, batch, key, url, strategy, attempts, on_result):
+        while True:
+            if self._quota_spent.is_set():
+                return
+            if not self.queue.take_quota(quota_day(), self.per_day):
+                self._quota_spent.set()
+                return
+            self._bucket.acquire()
+            attempts += 1
+            try:
+                result = audit_core.pagespeed_report(url, self.api_key, strategy, self.endpoint,
+                                                     session=http_client.get_session(retry_status=False))
+                error = None
+            except requests.exceptions.RequestException as e:
+                response = getattr(e, 'response', None)
+                status = response.status_code if response is not None else None
+                # No status means a network error, worth retrying, unless the body was not JSON.
+                transient = status in RETRY_STATUSES or (status is None and not isinstance(e, ValueError))
+                if transient and attempts < self.max_attempts:
+                    time.sleep(self._backoff(attempts, response))
+                    continue
+                result, error = None, str(e)
+            except Exception as e:  # e.g. a response body that is JSON but not a PSI result
+                result, error = None, f"Unreadable PSI response: {type(e).__name__}: {e}"
+                print(f"PSI {strategy} run of {url} failed: {error}", file=sys.stderr)
+            self.queue.finish(batch, key, strategy, attempts, result, error)
+            if on_result:
+                on_result(url, strategy, result, error)
+            return
+
+    def run(self, batch, on_result=None):
+        """Work through the batch's pending rows; return its progress counts.
+
+        Stops early, leaving rows pending, once the day's quota is spent.
+        """
+        if not self.api_key:
+            raise ValueError("Google PageSpeed API Key not found.")
+        self._quota_spent.clear()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="psi-batch") as executor:
+            for key, url, strategy, attempts in self.queue.pending(batch):
+                executor.submit(self._run_one, batch, key, url, strategy, attempts, on_result)
+        progress = self.queue.progress(batch)
+        progress['quota_spent'] = self._quota_spent.is_set()
+        return progress
+
+
+@lazy_default
+def default_queue():
+    return PsiQueue(os.path.join(CACHE_DIR, 'psi.sqlite'))
+
+
+def main(argv=None):
+    from audit_cli import iter_input_urls
+
+    parser = argparse.ArgumentParser(description="Run PageSpeed Insights on many URLs within the API quota.")
+    parser.add_argument('batch', help="Batch name; running the same batch again resumes it")
+    parser.add_argument('sources', nargs='*', help="URL list files ('-' for stdin) or sitemap paths/URLs to add")
+    parser.add_argument('--strategy', nargs='+', choices=audit_core.PSI_STRATEGIES, default=['mobile'])
+    parser.add_argument('--per-second', type=float, default=DEFAULT_PER_SECOND, help="Per-second request quota")
+    parser.add_argument('--per-day', type=int, default=DEFAULT_PER_DAY, help="Per-day request quota")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Concurrent PSI calls")
+    parser.add_argument('--endpoint', help="PSI endpoint (e.g. a local stub server)")
+    parser.add_argument('--output', help="Write finished results of the batch as JSONL")
+    args = parser.parse_args(argv)
+
+    queue = default_queue()
+    if args.sources:
+        queued = queue.enqueue(args.batch, iter_input_urls(args.sources), args.strategy)
+        print(f"Queued {len(queued)} unique URLs", file=sys.stderr)
+
+    api_key = os.environ.get('GOOGLE_PAGESPEED_API_KEY')
+    if not api_key:
+        sys.exit("Set GOOGLE_PAGESPEED_API_KEY to run PageSpeed Insights.")
+    scheduler = PsiScheduler(api_key, queue, args.per_second, args.per_day, args.workers, endpoint=args.endpoint)
+    progress = scheduler.run(args.batch)
+    print(f"{progress['done']} done, {progress['failed']} failed, {progress['pending']} pending"
+          + (" (daily quota spent; run again tomorrow to resume)" if progress['quota_spent'] else ""),
+          file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            for url, strategy, results, error in queue.results(args.batch):
+                scores = results.scores if results else dict.fromkeys(PSI_CATEGORIES)
+                row = {'url': url, 'strategy': strategy, 'scores': scores, 'error': error}
+                handle.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote, unquote, urljoin, urlsplit
+
+import requests
+
+import http_client
+from storage import lazy_default
+
+# --- Per-host robots.txt cache ---
+# robots.txt is fetched once per origin (scheme, host and port) and kept for
+# ROBOTS_TTL, so the crawler and the Technical tab share one download. Each
+# user-agent group is compiled on first use: plain path prefixes go into a
+# dict probed at each distinct rule length, longest first, and only rules with
+# `*` or `$` become regexes. Matching follows RFC 9309: the longest matching
+# rule wins and Allow wins a tie. A 4xx robots.txt allows everything; a 5xx or
+# an unreachable one disallows everything until it can be fetched again, but
+# a previously fetched copy keeps being served instead.
+
+ROBOTS_TTL = 24 * 3600
+ROBOTS_ERROR_TTL = 5 * 60
+ROBOTS_TIMEOUT = 5
+ROBOTS_MAX_BYTES = 500 * 1024
+CRAWLER_AGENT = '*'
+
+_SAFE_PATH_CHARS = "/?=&;:@!$'()*+,~"
+
+
+def _encode_path(path):
+    """Percent-encode a path the same way for rules and URLs so they compare byte for byte."""
+    return quote(unquote(path), safe=_SAFE_PATH_CHARS)
+
+
+def _url_path(url):
+    parts = urlsplit(url)
+    path = _encode_path(parts.path or '/')
+    return f'{path}?{parts.query}' if parts.query else path
+
+
+def _compile(pattern):
+    anchored = pattern.endswith('$')
+    body = '.*'.join(re.escape(piece) for piece in pattern.rstrip('$').split('*'))
+    return re.compile(body + (r'\Z' if anchored else ''))
+
+
+class _Ruleset:
+    __slots__ = ('crawl_delay', '_prefixes', '_lengths', '_patterns')
+
+    def __init__(self, rules=(), crawl_delay=None):
+        self.crawl_delay = crawl_delay
+        self._prefixes = {}  # {path prefix: allow}
+        self._patterns = []  # [(length, allow, regex)]
+        for allow, path in rules:
+            if not path:
+                continue
+            path = _encode_path(path)
+            if '*' in path or path.endswith('$'):
+                self._patterns.append((len(path), allow, _compile(path)))
+            else:
+                self._prefixes[path] = self._prefixes.get(path, False) or allow
+        self._lengths = sorted({len(prefix) for prefix in self._prefixes}, reverse=True)
+
+    def allowed(self, path):
+        best = (0, True)
+        for length in self._lengths:
+            if length <= len(path):
+                allow = self._prefixes.get(path[:length])
+                if allow is not None:
+                    best = (length, allow)
+                    break
+        for length, allow, pattern in self._patterns:
+            if (length, allow) > best and pattern.match(path):
+                best = (length, allow)
+        return best[1]
+
+
+def parse_robots(text):
+    """({agent: {'rules': [(allow, path)], 'crawl_delay': seconds}}, [sitemap urls]).
+
+    Agents are lower-cased; groups naming the same agent are merged.
+    """
+    groups, sitemaps = {}, []
+    agents, in_rules = [], False
+    for line in text.splitlines():
+        key, _, value = line.split('#', 1)[0].partition(':')
+        key, value = key.strip().lower(), value.strip()
+        if key == 'user-agent':
+            if in_rules:
+                agents, in_rules = [], False
+            agents.append(value.lower())
+            groups.setdefault(value.lower(), {'rules': [], 'crawl_delay': None})
+        elif key in ('allow', 'disallow'):
+            in_rules = True
+            for agent in agents:
+                groups[agent]['rules'].append((key == 'allow', value))
+        elif key == 'crawl-delay':
+            in_rules = True
+            try:
+                delay = float(value)
+            except ValueError:
+                continue
+            for agent in agents:
+                groups[agent]['crawl_delay'] = delay
+        elif key == 'sitemap' and value and value not in sitemaps:
+            sitemaps.append(value)
+    return groups, sitemaps
+
+
+class RobotsRules:
+    """A site's parsed robots.txt; `text` is None when the site has none."""
+
+    def __init__(self, url, status_code=None, text=None, error=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.error = error
+        self._groups, self.sitemaps = parse_robots(text) if text else ({}, [])
+        self._compiled = {}
+
+    def _ruleset(self, agent):
+        agent = agent.lower()
+        ruleset = self._compiled.get(agent)
+        if ruleset is None:
+            group = self._groups.get(agent) or self._groups.get('*') or {}
+            ruleset = self._compiled[agent] = _Ruleset(group.get('rules', ()), group.get('crawl_delay'))
+        return ruleset
+
+    def can_fetch(self, url, agent=CRAWLER_AGENT):
+        if self.error:
+            return False
+        return self._ruleset(agent).allowed(_url_path(url))
+
+    def crawl_delay(self, agent=CRAWLER_AGENT):
+        return self._ruleset(agent).crawl_delay
+
+
+def fetch_robots(url, timeout=ROBOTS_TIMEOUT):
+    """Download and parse robots.txt for the URL's origin."""
+    robots_url = urljoin(url, '/robots.txt')
+    try:
+        with http_client.fetch(robots_url, timeout=timeout, stream=True) as response:
+            status = response.status_code
+            body = response.raw.read(ROBOTS_MAX_BYTES, decode_content=True) if 200 <= status < 300 else b''
+    except requests.exceptions.RequestException as e:
+        return RobotsRules(robots_url, error=str(e))
+    if 200 <= status < 300:
+        return RobotsRules(robots_url, status, body.decode('utf-8-sig', errors='replace'))
+    if 400 <= status < 500:
+        return RobotsRules(robots_url, status)
+    return RobotsRules(robots_url, status, error=f"robots.txt answered HTTP {status}")
+
+
+class RobotsCache:
+    def __init__(self, ttl=ROBOTS_TTL, error_ttl=ROBOTS_ERROR_TTL):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._entries = {}  # {origin: (expires_at, RobotsRules)}
+        self._lock = threading.Lock()
+        self._fetch_locks = defaultdict(threading.Lock)
+
+    def get(self, url):
+        """RobotsRules for the URL's origin, downloaded at most once per TTL."""
+        parts = urlsplit(url)
+        origin = f'{parts.scheme.lower()}://{parts.netloc.lower()}'
+        entry = self._entries.get(origin)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        with self._lock:
+            fetch_lock = self._fetch_locks[origin]
+        with fetch_lock:
+            entry = self._entries.get(origin)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            rules, ttl = fetch_robots(origin), self.ttl
+            if rules.error:
+                ttl = self.error_ttl
+                if entry and not entry[1].error:
+                    rules = entry[1]
+            self._entries[origin] = (time.monotonic() + ttl, rules)
+            return rules
+
+    def can_fetch(self, url, agent=CRAWLER_AGENT):
+        return self.get(url).can_fetch(url, agent)
+
+    def crawl_delay(self, url, agent=CRAWLER_AGENT):
+        return self.get(url).crawl_delay(agent)
+
+    def sitemaps(self, url):
+        return self.get(url).sitemaps
+
+
+@lazy_default
+def default_cache():
+    return RobotsCache()
@@ -0,0 +1,52 @@
+import re
+
+# --- Page-level SEO checks ---
+# Pass/fail status of each on-page check, computed from a PageRecord. These are
+# the statuses compared between crawls by the incremental re-audit.
+
+GENERIC_LINK_TEXT = ['click here', 'learn more', 'read more', 'more info']
+GENERIC_IMAGE_NAME = re.compile(r'IMG_\d+|image\d+|\w{8}-\w{4}-\w{4}-\w{4}-\w{12}')
+
+
+CHECK_NAMES = (
+    'Page loads', 'Title present', 'Title length 15-60', 'Meta description present',
+    'Meta description length 70-160', 'H1 present', 'Viewport meta tag', 'No generic link text',
+    'All images have alt text', 'Descriptive image filenames', 'Open Graph tags', 'Twitter Card tags',
+    'JSON-LD structured data', 'No robots meta tag', 'Canonical tag',
+)
+
+
+def generic_link_texts(page):
+    return [text for _, text in page.links if text.lower() in GENERIC_LINK_TEXT]
+
+
+def images_missing_alt(page):
+    return [src for src, alt in page.images if not (alt or '').strip()]
+
+
+def generic_image_filenames(page):
+    return [src for src, _ in page.images if GENERIC_IMAGE_NAME.search(str(src))]
+
+
+def seo_checks(page):
+    if page.error:
+        return {'Page loads': False}
+    title_len = len(page.title)
+    desc_len = len(page.meta_description)
+    return {
+        'Page loads': True,
+        'Title present': bool(page.title),
+        'Title length 15-60': 15 <= title_len <= 60,
+        'Meta description present': bool(page.meta_description),
+        'Meta description length 70-160': 70 <= desc_len <= 160,
+        'H1 present': bool(page.h1_tags),
+        'Viewport meta tag': page.has_viewport,
+        'No generic link text': not generic_link_texts(page),
+        'All images have alt text': not images_missing_alt(page),
+        'Descriptive image filenames': not generic_image_filenames(page),
+        'Open Graph tags': page.og_title is not None,
+        'Twitter Card tags': page.twitter_title is not None,
+        'JSON-LD structured data': page.has_json_ld,
+        'No robots meta tag': page.meta_robots is None,
+        'Canonical tag': page.canonical is not None,
+    }
@@ -0,0 +1,126 @@
+import gzip
+import io
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+
+import requests
+
+import http_client
+
+# --- Sitemap reading ---
+# Yields page URLs from a sitemap or sitemap index (local file or URL, plain or
+# gzipped), following nested indexes, and finds a site's sitemaps. Sitemaps
+# are parsed incrementally from the network stream and each <url> element is
+# cleared once read, so memory stays flat for sitemaps of millions of URLs.
+
+GZIP_MAGIC = b'\x1f\x8b'
+SITEMAP_ERRORS = (requests.exceptions.RequestException, ET.ParseError, OSError, EOFError)
+
+
+def is_sitemap(location):
+    path = location.split('?', 1)[0].lower()
+    return path.endswith(('.xml', '.xml.gz'))
+
+
+class _Prefixed(io.RawIOBase):
+    """A byte stream with its first few bytes already read (to sniff for gzip) put back in front."""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._prefix[:len(buffer)] if self._prefix else self._stream.read(len(buffer))
+        self._prefix = self._prefix[len(data):]
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._stream.close()
+        super().close()
+
+
+def _open(location):
+    if location.startswith(('http://', 'https://')):
+        response = http_client.fetch(location, timeout=30, stream=True)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        raw = response.raw
+    else:
+        raw = open(location, 'rb')
+    return io.BufferedReader(_Prefixed(raw.read(2), raw))
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iter_locs(location):
+    """Yield (is_index, loc) for each entry of one sitemap file, clearing parsed elements."""
+    with _open(location) as stream:
+        reader = gzip.GzipFile(fileobj=stream) if stream.peek(2)[:2] == GZIP_MAGIC else stream
+        context = ET.iterparse(reader, events=('start', 'end'))
+        _, root = next(context)
+        is_index = _local_name(root.tag) == 'sitemapindex'
+        for event, element in context:
+            if event == 'end' and _local_name(element.tag) in ('url', 'sitemap'):
+                for child in element:
+                    if _local_name(child.tag) == 'loc' and child.text and child.text.strip():
+                        yield is_index, child.text.strip()
+                        break
+                root.clear()
+
+
+def iter_sitemap_urls(location, on_error=None, _seen=None):
+    """Page URLs of a sitemap, following index entries.
+
+    A child sitemap that fails to load is skipped, and reported to
+    on_error(child, error), so the rest of the index is still read; a failure
+    of location itself propagates.
+    """
+    seen = _seen if _seen is not None else set()
+    if location in seen:
+        return
+    seen.add(location)
+
+    children = []
+    for is_index, loc in _iter_locs(location):
+        if is_index:
+            children.append(loc)
+        else:
+            yield loc
+    # An index is read to the end first, so its connection is not held open
+    # while the (possibly huge) child sitemaps stream.
+    for child in children:
+        try:
+            yield from iter_sitemap_urls(child, on_error, seen)
+        except SITEMAP_ERRORS as e:
+            if on_error:
+                on_error(child, e)
+
+
+def iter_site_sitemap_urls(sitemap_locations):
+    """Page URLs from several sitemaps in turn; a sitemap that fails to load is skipped."""
+    seen = set()
+    for location in sitemap_locations:
+        try:
+            yield from iter_sitemap_urls(location, _seen=seen)
+        except SITEMAP_ERRORS:
+            continue
+
+
+def discover_sitemaps(url, declared=()):
+    """The sitemaps declared in robots.txt, plus /sitemap.xml if it exists."""
+    found = list(declared)
+
+    fallback = urljoin(url, '/sitemap.xml')
+    if fallback not in found:
+        try:
+            if http_client.head(fallback).status_code == 200:
+                found.append(fallback)
+        except requests.exceptions.RequestException:
+            pass
+    return found
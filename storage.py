@@ -0,0 +1,41 @@
+import functools
+import os
+import sqlite3
+import threading
+
+# --- Local storage ---
+# Every persistent store of the app (page cache, snapshots, PSI queue and
+# history, asset and link caches, crawl log, work queue) is one SQLite file
+# under CACHE_DIR, opened with open_db: one connection per store, shared by
+# threads behind the store's own lock, in WAL mode so readers never wait on a
+# writer. Each module's default instance is built on first use through
+# lazy_default.
+
+CACHE_DIR = os.environ.get('WEB_AUDIT_CACHE_DIR', '.audit_cache')
+
+
+def open_db(path, schema, **connect_args):
+    """Connection to the SQLite file at path in WAL mode, with schema applied."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, **connect_args)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(schema)
+    return conn
+
+
+def lazy_default(factory):
+    """Decorator: the function returns factory()'s result, built once on first call, from any thread."""
+    instance = None
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get():
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+        return instance
+    return get
@@ -1,170 +1,199 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from urllib.parse import urljoin, urlparse
 import textstat
-import base64
 import io
 import json
-from concurrent.futures import ThreadPoolExecutor
-import re
-from collections import Counter
+import os
+import time
+
+from crawler import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST
+import http_client
+import politeness
+import audit_core
+import audit_jobs
+import crawl_store
+from audit_core import PSI_STRATEGIES, suggest_keywords, keyword_analysis
+from asset_inventory import inventory_summary
+from psi_history import default_history
+from psi_report import PSI_CATEGORIES, OPPORTUNITY_AUDITS
+from seo_checks import generic_link_texts, images_missing_alt, generic_image_filenames
+from urls import STRIP_PARAMS
 
 # --- Configuration ---
 st.set_page_config(page_title="Website Auditor Pro", page_icon="🕵️‍♀️", layout="wide")
 
-# A simple list of common English stop words for keyword analysis
-STOP_WORDS = set([
-    'a', 'about', 'above', 'after', 'again', 'against', 'all', 'am', 'an', 'and', 'any', 'are', "aren't", 'as', 'at',
-    'be', 'because', 'been', 'before', 'being', 'below', 'between', 'both', 'but', 'by', 'can', "can't", 'cannot',
-    'com', 'could', "couldn't", 'did', "didn't", 'do', 'does', "doesn't", 'doing', "don't", 'down', 'during',
-    'each', 'few', 'for', 'from', 'further', 'had', "hadn't", 'has', "hasn't", 'have', "haven't", 'having', 'he',
-    "he'd", "he'll", "he's", 'her', 'here', "here's", 'hers', 'herself', 'him', 'himself', 'his', 'how', "how's",
-    'i', "i'd", "i'll", "i'm", "i've", 'if', 'in', 'into', 'is', "isn't", 'it', "it's", 'its', 'itself', "let's",
-    'me', 'more', 'most', "mustn't", 'my', 'myself', 'no', 'nor', 'not', 'of', 'off', 'on', 'once', 'only', 'or',
-    'other', 'ought', 'our', 'ours', 'ourselves', 'out', 'over', 'own', 'r', 'same', 'she', "she'd", "she'll",
-    "she's", 'should', "shouldn't", 'so', 'some', 'such', 'than', 'that', "that's", 'the', 'their', 'theirs',
-    'them', 'themselves', 'then', 'there', "there's", 'these', 'they', "they'd", "they'll", "they're", "they've",
-    'this', 'those', 'through', 'to', 'too', 'under', 'until', 'up', 'very', 'was', "wasn't", 'we', "we'd",
-    "we'll", "we're", "we've", 'were', "weren't", 'what', "what's", 'when', "when's", 'where', "where's",
-    'which', 'while', 'who', "who's", 'whom', 'why', "why's", 'with', "won't", 'would', "wouldn't", 'you',
-    "you'd", "you'll", "you're", "you've", 'your', 'yours', 'yourself', 'yourselves', 'www', 'https'
-])
-
 # --- Caching & Analysis Functions ---
 @st.cache_data(ttl=1800)
-def audit_page(url):
-    results = {'url': url, 'status_code': None, 'error': None, 'soup': None}
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=20)
-        results['status_code'] = response.status_code
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        results['soup'] = soup
-        results['headers'] = response.headers
-        
-        title = soup.find('title')
-        results['title'] = title.text.strip() if title else ""
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        results['meta_description'] = meta_desc['content'].strip() if meta_desc else ""
-        results['h1_tags'] = [h1.text.strip() for h1 in soup.find_all('h1')]
-        
-        return results
-    except requests.exceptions.RequestException as e:
-        results['error'] = str(e)
-        return results
+def audit_page(url, max_bytes=http_client.DEFAULT_MAX_BYTES):
+    return audit_core.audit_page(url, max_bytes)
 
 @st.cache_data(ttl=1800)
-def run_pagespeed_insights(url):
-    api_key = st.secrets.get("GOOGLE_PAGESPEED_API_KEY")
-    if not api_key: return None, "Google PageSpeed API Key not found."
-    api_url = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url}&strategy=mobile&category=performance&category=accessibility&category=seo&category=best-practices&key={api_key}"
-    try:
-        response = requests.get(api_url, timeout=90)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.exceptions.RequestException as e:
-        return None, str(e)
-
-def suggest_keywords(soup):
-    if not soup: return []
-    for script_or_style in soup(["script", "style"]):
-        script_or_style.decompose()
-    text = soup.get_text()
-    words = re.findall(r'\b\w{4,15}\b', text.lower())
-    meaningful_words = [word for word in words if word not in STOP_WORDS and not word.isdigit()]
-    return [word for word, _ in Counter(meaningful_words).most_common(10)]
-
-def get_internal_links(base_url, soup):
-    links = {urljoin(base_url, a['href']) for a in soup.find_all('a', href=True)}
-    return {link for link in links if urlparse(link).netloc == urlparse(base_url).netloc}
+def run_pagespeed_insights(url, strategy='mobile'):
+    return audit_core.run_pagespeed_insights(url, st.secrets.get("GOOGLE_PAGESPEED_API_KEY"), strategy)
 
 # --- UI Display Functions ---
+STRATEGY_LABELS = {'mobile': "📱 Mobile", 'desktop': "🖥️ Desktop"}
+HISTORY_DAYS = 90
+
+def load_psi_history(url, strategies):
+    """{strategy: (daily series, previous run, regressions)} from the local PSI history."""
+    history = default_history()
+    since = time.time() - HISTORY_DAYS * 86400
+    loaded = {}
+    for strategy in strategies:
+        runs = history.latest(url, strategy, 2)
+        loaded[strategy] = (history.series(url, strategy, since=since, bucket=86400),
+                            runs[1] if len(runs) > 1 else None, history.regressions(url, strategy))
+    return loaded
 
-def display_summary(psi_results, soup):
+def format_psi_value(label, value):
+    if label in PSI_CATEGORIES: return f"{value:.0f}"
+    if label == 'Cumulative Layout Shift': return f"{value:.3f}"
+    if label == 'Total Blocking Time': return f"{value:.0f} ms"
+    return f"{value / 1000:.1f} s"
+
+def display_summary(psi_by_strategy, page, history=None):
     st.header("Audit Summary 📝", divider="rainbow")
-    if not psi_results:
+    reports = {strategy: report for strategy, report in psi_by_strategy.items() if report}
+    if not reports:
         st.error("Could not retrieve PageSpeed Insights data to generate a summary.")
         return
 
-    report = psi_results.get('lighthouseResult', {})
-    scores = {
-        'Performance': report.get('categories', {}).get('performance', {}).get('score', 0) * 100,
-        'Accessibility': report.get('categories', {}).get('accessibility', {}).get('score', 0) * 100,
-        'SEO': report.get('categories', {}).get('seo', {}).get('score', 0) * 100,
-        'Best Practices': report.get('categories', {}).get('best-practices', {}).get('score', 0) * 100,
-    }
-
-    cols = st.columns(4)
-    cols[0].metric("Performance", f"{scores['Performance']:.0f}/100")
-    cols[1].metric("Accessibility", f"{scores['Accessibility']:.0f}/100")
-    cols[2].metric("SEO", f"{scores['SEO']:.0f}/100")
-    cols[3].metric("Best Practices", f"{scores['Best Practices']:.0f}/100")
+    history = history or {}
+    for strategy, report in reports.items():
+        series, previous, regressions = history.get(strategy, ([], None, []))
+        if len(reports) > 1: st.markdown(f"**{STRATEGY_LABELS.get(strategy, strategy)}**")
+        cols = st.columns(4)
+        for col, (label, score) in zip(cols, report.scores.items()):
+            trend = [point[label] for point in series if point[label] is not None]
+            delta = score - previous[label] if score is not None and previous and previous[label] is not None else None
+            col.metric(label, f"{score:.0f}/100" if score is not None else "N/A",
+                       delta=f"{delta:+.0f} since last run" if delta else None,
+                       chart_data=trend if len(trend) > 1 else None, chart_type='area')
+        for label, baseline, latest in regressions:
+            st.warning(f"**Regression:** {label} is {format_psi_value(label, latest)}, against a recent median of {format_psi_value(label, baseline)}.")
     
     st.divider()
-    left_col, right_col = st.columns(2)
-    with left_col:
-        st.subheader("Mobile Viewport")
-        screenshot_data = report.get('audits', {}).get('final-screenshot', {}).get('details', {}).get('data')
-        if screenshot_data:
-            st.image(base64.b64decode(screenshot_data.split(',')[1]), caption="Mobile Screenshot")
-    with right_col:
+    cols = st.columns(len(reports) + 1)
+    for col, (strategy, report) in zip(cols, reports.items()):
+        with col:
+            label = strategy.capitalize()
+            st.subheader(f"{label} Viewport")
+            if report.screenshot:
+                st.image(report.screenshot, caption=f"{label} Screenshot")
+    with cols[-1]:
         st.subheader("Key Information")
-        st.info(f"**Title:** {soup.find('title').text if soup and soup.find('title') else 'N/A'}")
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        st.info(f"**Meta Description:** {meta_desc['content'] if meta_desc else 'N/A'}")
+        st.info(f"**Title:** {page.title or 'N/A'}")
+        st.info(f"**Meta Description:** {page.meta_description or 'N/A'}")
+
+def display_audit_details(audit, columns, title):
+    with st.expander(f"{title} - ({audit.get('displayValue', '')})", expanded=False):
+        st.markdown(audit.get('description'))
+        df = pd.DataFrame(audit['items'])
+        display_cols = [col for col in columns if col in df.columns]
+        st.dataframe(df[display_cols], width='stretch', hide_index=True)
 
-def display_performance_audit(psi_report):
+def display_static_performance(page_weight):
+    st.info("PageSpeed Insights is not available, so this is a static estimate from the page's HTML. It has no scores or Core Web Vitals.")
+    cols = st.columns(3)
+    cols[0].metric("Estimated Transfer Size", f"{page_weight['total_bytes'] / 1024:,.0f} KiB")
+    cols[1].metric("Requests", page_weight['request_count'])
+    cols[2].metric("Render-Blocking Resources", page_weight['render_blocking_count'])
+    if page_weight['unknown_sizes']:
+        st.caption(f"{page_weight['unknown_sizes']} resources did not report their size and count as 0 bytes.")
+    for audit_id, title, columns in OPPORTUNITY_AUDITS:
+        if audit_id in page_weight['opportunities']:
+            display_audit_details(page_weight['opportunities'][audit_id], columns, title)
+
+def display_performance_audit(psi_by_strategy, page_weight=None):
     st.header("Performance & Core Web Vitals ⚡", divider="rainbow")
-    perf_category = psi_report.get('categories', {}).get('performance', {})
-    if not perf_category: st.warning("Performance report not available."); return
+    reports = {strategy: report for strategy, report in psi_by_strategy.items() if report and report.has_performance}
+    if not reports:
+        if page_weight: display_static_performance(page_weight)
+        else: st.warning("Performance report not available.")
+        return
 
-    st.metric("Overall Performance Score", f"{perf_category.get('score', 0) * 100:.0f}/100")
-    
-    def display_audit_details(audit_id, columns, title):
-        audit = psi_report.get('audits', {}).get(audit_id, {})
-        if 'details' in audit and 'items' in audit['details'] and audit['details']['items']:
-            with st.expander(f"{title} - ({audit.get('displayValue', '')})", expanded=False):
-                st.markdown(audit.get('description'))
-                df = pd.DataFrame(audit['details']['items'])
-                display_cols = [col for col in columns if col in df.columns]
-                st.dataframe(df[display_cols], width='stretch', hide_index=True)
-    
-    display_audit_details('render-blocking-resources', ['url', 'totalBytes', 'wastedMs'], "Eliminate Render-Blocking Resources")
-    display_audit_details('uses-optimized-images', ['url', 'totalBytes', 'wastedBytes'], "Properly Size Images")
-    display_audit_details('uses-next-gen-images', ['url', 'totalBytes', 'wastedBytes'], "Serve Images in Next-Gen Formats")
-    display_audit_details('unused-javascript', ['url', 'totalBytes', 'wastedBytes'], "Reduce Unused JavaScript")
-    display_audit_details('unused-css-rules', ['url', 'totalBytes', 'wastedBytes'], "Reduce Unused CSS")
+    for col, (strategy, report) in zip(st.columns(len(reports)), reports.items()):
+        col.metric(f"Performance Score ({STRATEGY_LABELS.get(strategy, strategy)})", f"{report.scores['Performance']:.0f}/100")
+
+    if len(reports) > 1:
+        st.subheader("Lab Metrics Side by Side")
+        comparison = pd.DataFrame({STRATEGY_LABELS.get(strategy, strategy): report.metrics
+                                   for strategy, report in reports.items()})
+        st.dataframe(comparison, width='stretch')
 
-def display_seo_audit(soup, keyword):
+    strategy_tabs = st.tabs([STRATEGY_LABELS.get(strategy, strategy) for strategy in reports])
+    for tab, report in zip(strategy_tabs, reports.values()):
+        opportunities = report.opportunities
+        with tab:
+            for audit_id, title, columns in OPPORTUNITY_AUDITS:
+                if audit_id in opportunities:
+                    display_audit_details(opportunities[audit_id], columns, title)
+
+def display_asset_inventory(rows):
+    st.subheader("Asset Inventory")
+    if not rows:
+        st.info("The crawled pages reference no external scripts, stylesheets or images."); return
+    summary = inventory_summary(rows)
+    cols = st.columns(4)
+    cols[0].metric("Unique Assets", summary['assets'])
+    cols[1].metric("Total Size", f"{summary['total_bytes'] / 1024:,.0f} KiB")
+    cols[2].metric("Uncompressed CSS/JS", summary['uncompressed_text'])
+    cols[3].metric("No Cache-Control", summary['no_cache_policy'])
+    if summary['broken']:
+        st.warning(f"⚠️ {summary['broken']} assets could not be loaded.")
+    st.dataframe(pd.DataFrame(rows), width='stretch', hide_index=True, column_config={
+        'url': 'URL', 'kind': 'Type', 'pages': 'Used on Pages', 'status_code': 'Status', 'size': 'Bytes',
+        'content_type': 'Content-Type', 'cache_control': 'Cache-Control', 'content_encoding': 'Encoding', 'error': 'Error',
+    })
+
+def display_link_check(report):
+    broken, stats = report
+    st.subheader("Broken Links")
+    cols = st.columns(4)
+    cols[0].metric("Links Found", f"{stats['links']:,}")
+    cols[1].metric("Unique URLs", f"{stats['unique']:,}")
+    cols[2].metric("Requests Made", f"{stats['requested']:,}", help=f"{stats['from_crawl']:,} URLs were answered by the crawl itself and {stats['skipped']:,} are disallowed by robots.txt; the rest came from the link cache.")
+    cols[3].metric("Broken URLs", stats['broken'])
+    if not broken:
+        st.success(f"✅ No broken links, images or assets on the {stats['pages']} crawled pages."); return
+    broken_df = pd.DataFrame(broken)
+    st.warning(f"⚠️ {broken_df['source'].nunique()} pages link to broken URLs.")
+    st.dataframe(broken_df.groupby('source').size().rename('Broken Links').sort_values(ascending=False).reset_index().rename(columns={'source': 'Page'}), width='stretch', hide_index=True)
+    with st.expander(f"All broken links ({len(broken)})"):
+        st.dataframe(broken_df, width='stretch', hide_index=True, column_config={
+            'source': 'Page', 'url': 'Broken URL', 'kind': 'Type', 'status_code': 'Status', 'final_url': 'Redirected To', 'error': 'Error',
+        })
+
+def display_crawl_pagespeed(psi_by_url):
+    st.subheader("PageSpeed Scores for Crawled Pages")
+    rows = []
+    for url, by_strategy in psi_by_url.items():
+        for strategy, (report, error) in by_strategy.items():
+            scores = report.scores if report else dict.fromkeys(PSI_CATEGORIES)
+            rows.append({'URL': url, 'Strategy': STRATEGY_LABELS.get(strategy, strategy), **scores, 'Error': error})
+    if rows:
+        st.dataframe(pd.DataFrame(rows), width='stretch', hide_index=True)
+    else:
+        st.info("No crawled pages to run PageSpeed Insights on.")
+
+def display_seo_audit(page, keyword):
     st.header("SEO Analysis 🔍", divider="rainbow")
     
     if keyword:
         with st.expander("Keyword Analysis", expanded=True):
-            page_text = soup.get_text().lower()
-            keyword_count = page_text.count(keyword.lower())
-            word_count = len(page_text.split())
-            density = (keyword_count / word_count * 100) if word_count > 0 else 0
+            analysis = keyword_analysis(page, keyword)
+            st.metric(f"Keyword Density for '{keyword}'", f"{analysis['density']:.2f}% ({analysis['count']} mentions)")
             
-            st.metric(f"Keyword Density for '{keyword}'", f"{density:.2f}% ({keyword_count} mentions)")
-            
-            title_text = soup.find('title').text if soup.find('title') else ""
-            meta_desc_content = soup.find('meta', attrs={'name': 'description'}).get('content','') if soup.find('meta', attrs={'name': 'description'}) else ""
-            h1_texts = [h1.text for h1 in soup.find_all('h1')]
-            
-            st.info(f"Keyword in Title: {'✅ Yes' if keyword.lower() in title_text.lower() else '❌ No'}")
-            st.info(f"Keyword in Meta Description: {'✅ Yes' if keyword.lower() in meta_desc_content.lower() else '❌ No'}")
-            st.info(f"Keyword in H1 Tags: {'✅ Yes' if any(keyword.lower() in h1.lower() for h1 in h1_texts) else '❌ No'}")
+            st.info(f"Keyword in Title: {'✅ Yes' if analysis['in_title'] else '❌ No'}")
+            st.info(f"Keyword in Meta Description: {'✅ Yes' if analysis['in_meta_description'] else '❌ No'}")
+            st.info(f"Keyword in H1 Tags: {'✅ Yes' if analysis['in_h1'] else '❌ No'}")
     else:
         st.info("Enter a target keyword in the sidebar to run a keyword-specific analysis.")
 
     with st.expander("General On-Page SEO", expanded=True):
-        title = soup.find('title')
-        if title:
-            title_text = title.text.strip()
+        if page.title:
+            title_text = page.title
             title_len = len(title_text)
             st.success(f"**Title Tag:** {title_text}")
             if 15 <= title_len <= 60:
@@ -174,9 +203,8 @@ def display_seo_audit(soup, keyword):
         else:
             st.warning("**Title Tag:** ❌ Missing!")
 
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc and meta_desc.get('content'):
-            desc_text = meta_desc.get('content').strip()
+        if page.meta_description:
+            desc_text = page.meta_description
             desc_len = len(desc_text)
             st.success(f"**Meta Description:** {desc_text}")
             if 70 <= desc_len <= 160:
@@ -186,21 +214,20 @@ def display_seo_audit(soup, keyword):
         else:
             st.warning("**Meta Description:** ❌ Missing or empty!")
 
-        h1_tags = soup.find_all('h1')
+        h1_tags = page.h1_tags
         if h1_tags:
             st.success(f"**H1 Tags Found ({len(h1_tags)}):**")
             for h1 in h1_tags:
-                st.markdown(f"- `{h1.text.strip()}`")
+                st.markdown(f"- `{h1}`")
         else:
             st.warning("**H1 Tags:** ❌ Missing!")
         
-        if soup.find('meta', attrs={'name': 'viewport'}):
+        if page.has_viewport:
             st.success("**Viewport Meta Tag:** ✅ Present")
         else:
             st.warning("**Viewport Meta Tag:** ❌ Missing!")
         
-        links = soup.find_all('a', href=True)
-        generic_links = [link.text.strip() for link in links if link.text.strip().lower() in ['click here', 'learn more', 'read more', 'more info']]
+        generic_links = generic_link_texts(page)
         if not generic_links:
             st.success("**Link Text:** ✅ No generic link text found.")
         else:
@@ -209,79 +236,144 @@ def display_seo_audit(soup, keyword):
                 st.json(generic_links)
 
     with st.expander("Image SEO"):
-        images = soup.find_all('img')
-        images_without_alt = [img for img in images if not img.get('alt', '').strip()]
+        images = page.images
+        images_without_alt = images_missing_alt(page)
         if not images_without_alt:
             st.success("**Alt Text:** ✅ All images have alt attributes.")
         else:
             st.warning(f"**Alt Text:** ⚠️ {len(images_without_alt)} of {len(images)} images are missing alt text.")
         
-        generic_filenames = [img.get('src') for img in images if re.search(r'IMG_\d+|image\d+|\w{8}-\w{4}-\w{4}-\w{4}-\w{12}', str(img.get('src')))]
+        generic_filenames = generic_image_filenames(page)
         if not generic_filenames:
             st.success("**Image Filenames:** ✅ Appear descriptive.")
         else:
             st.warning(f"**Image Filenames:** ⚠️ {len(generic_filenames)} images may have non-descriptive filenames.")
     
     with st.expander("Social & Structured Data"):
-        og_title = soup.find('meta', property='og:title')
-        twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
-        json_ld = soup.find('script', type='application/ld+json')
-        st.info(f"**Open Graph Tags:** {'✅ Present' if og_title else '⚠️ Missing'}")
-        st.info(f"**Twitter Card Tags:** {'✅ Present' if twitter_title else '⚠️ Missing'}")
-        st.info(f"**JSON-LD Structured Data:** {'✅ Present' if json_ld else '⚠️ Missing'}")
-
-def display_technical_audit(soup, url):
+        st.info(f"**Open Graph Tags:** {'✅ Present' if page.og_title is not None else '⚠️ Missing'}")
+        st.info(f"**Twitter Card Tags:** {'✅ Present' if page.twitter_title is not None else '⚠️ Missing'}")
+        st.info(f"**JSON-LD Structured Data:** {'✅ Present' if page.has_json_ld else '⚠️ Missing'}")
+
+def display_technical_audit(page, robots, sitemap_urls):
     st.header("Technical SEO Audit ⚙️", divider="rainbow")
     
     with st.expander("Crawling & Indexing"):
-        robots_meta = soup.find('meta', attrs={'name': 'robots'})
-        if robots_meta:
-            st.warning(f"**Robots Meta Tag Found:** `{robots_meta.get('content')}`. Ensure this is intended.")
+        if page.meta_robots is not None:
+            st.warning(f"**Robots Meta Tag Found:** `{page.meta_robots}`. Ensure this is intended.")
         else:
             st.success("**Robots Meta Tag:** ✅ Not found (page is likely indexable).")
             
-        robots_url = urljoin(url, "/robots.txt")
-        try:
-            robots_res = requests.get(robots_url, timeout=5)
-            if robots_res.status_code == 200:
-                st.success("**Robots.txt:** ✅ Found.")
-                st.code(robots_res.text)
-            else:
-                st.warning("**Robots.txt:** ⚠️ Not Found.")
-        except requests.exceptions.RequestException:
+        if robots.error:
             st.error("Could not check for robots.txt.")
+        elif robots.text is not None:
+            st.success("**Robots.txt:** ✅ Found.")
+            if not robots.can_fetch(page.url, 'Googlebot'):
+                st.warning("⚠️ robots.txt blocks Googlebot from crawling this page.")
+            if robots.crawl_delay() is not None:
+                st.caption(f"Crawl-delay: {robots.crawl_delay():g} s")
+            st.code(robots.text)
+        else:
+            st.warning("**Robots.txt:** ⚠️ Not Found.")
+
+        if sitemap_urls:
+            st.success(f"**Sitemaps:** ✅ {len(sitemap_urls)} found.")
+            for sitemap_url in sitemap_urls: st.caption(f"`{sitemap_url}`")
+        else:
+            st.warning("**Sitemaps:** ⚠️ None declared in robots.txt and no /sitemap.xml.")
             
-        canonical_tag = soup.find('link', rel='canonical')
-        st.success(f"**Canonical Tag:** {'✅ Present' if canonical_tag else '⚠️ Missing'}")
-        if canonical_tag: st.caption(f"Canonical URL: `{canonical_tag.get('href')}`")
+        st.success(f"**Canonical Tag:** {'✅ Present' if page.canonical is not None else '⚠️ Missing'}")
+        if page.canonical is not None: st.caption(f"Canonical URL: `{page.canonical}`")
         
-        hreflang_tags = soup.find_all('link', rel='alternate', hreflang=True)
-        st.success(f"**Hreflang Tags:** {'✅ Present' if hreflang_tags else 'ℹ️ Not found (only for multi-language sites)'}")
+        st.success(f"**Hreflang Tags:** {'✅ Present' if page.hreflang else 'ℹ️ Not found (only for multi-language sites)'}")
 
     with st.expander("Site Branding"):
-        favicon = soup.find('link', rel=re.compile(r'icon'))
-        if favicon:
+        if page.favicon is not None:
             st.success("**Favicon:** ✅ Declared in HTML.")
-            st.caption(f"Favicon URL: `{favicon.get('href')}`")
+            st.caption(f"Favicon URL: `{page.favicon}`")
         else:
             st.warning("**Favicon:** ⚠️ Not declared in HTML.")
 
-def display_crawl_results(crawl_data):
+def format_crawl_job(job):
+    stopped = time.strftime('%Y-%m-%d %H:%M', time.localtime(job['updated_at']))
+    return f"{job['start_url']}: {job['done']} of {job['options']['max_pages']} pages (last active {stopped})"
+
+def display_crawl_results(crawl_data, link_metrics=None):
     st.header("Site Crawl Overview 🗺️", divider="rainbow")
     if not crawl_data or len(crawl_data) <= 1: 
         st.info("Crawl was not initiated or no additional internal links were found on the homepage."); return
     
     st.markdown(f"Analyzed **{len(crawl_data)}** pages in total.")
     crawl_df_data = [{
-        'URL': res.get('url'),
-        'Status': res.get('status_code'),
-        'Title Present': '✅' if res.get('title') else '❌',
-        'Meta Desc. Present': '✅' if res.get('meta_description') else '❌',
-        'H1 Count': len(res.get('h1_tags', [])),
-        'Error': res.get('error', 'None')
+        'URL': res.url,
+        'Status': res.status_code,
+        'Title Present': '✅' if res.title else '❌',
+        'Meta Desc. Present': '✅' if res.meta_description else '❌',
+        'H1 Count': len(res.h1_tags),
+        'Error': res.error or 'None'
     } for res in crawl_data]
-    
-    st.dataframe(pd.DataFrame(crawl_df_data), width='stretch', hide_index=True)
+    crawl_df = pd.DataFrame(crawl_df_data)
+
+    if link_metrics:
+        links_df = pd.DataFrame({
+            'URL': link_metrics['url'],
+            'Click Depth': pd.Series(link_metrics['click_depth']).where(lambda depth: depth >= 0).astype('Int64'),
+            'Inlinks': link_metrics['inlinks'],
+            'Outlinks': link_metrics['outlinks'],
+            'Internal PageRank': link_metrics['pagerank'].round(2),
+            'Orphan': ['⚠️' if orphan else '' for orphan in link_metrics['orphan']],
+        })
+        crawl_df = crawl_df.merge(links_df, on='URL', how='left')
+        orphans = int(link_metrics['orphan'].sum())
+        if orphans:
+            st.warning(f"⚠️ {orphans} crawled pages have no internal links pointing to them (orphan candidates).")
+        st.caption("Click depth is the fewest clicks from the start page (blank: no link path). Internal PageRank is scaled so an average page scores 1.")
+
+    st.dataframe(crawl_df, width='stretch', hide_index=True)
+
+def display_crawl_diff(report):
+    st.subheader("Changes Since Last Crawl")
+    cols = st.columns(5)
+    cols[0].metric("New Pages", len(report['new']))
+    cols[1].metric("Not Seen This Crawl", len(report['removed']))
+    cols[2].metric("Changed Pages", len(report['changed']))
+    cols[3].metric("Unchanged Pages", report['unchanged'])
+    cols[4].metric("SEO Checks Reused", report['reused'], help="Pages whose content hash matched the last crawl, so their stored SEO check results were kept instead of re-running the checks.")
+
+    if report['check_changes']:
+        st.warning(f"⚠️ {len(report['check_changes'])} SEO check results changed on {len(report['changed'])} changed pages.")
+        status = {True: '✅ Pass', False: '❌ Fail', None: '—'}
+        st.dataframe(pd.DataFrame([{
+            'URL': change['url'],
+            'Check': change['check'],
+            'Before': status[change['before']],
+            'After': status[change['after']],
+        } for change in report['check_changes']]), width='stretch', hide_index=True)
+    else:
+        st.success("✅ No SEO check results changed since the last crawl.")
+
+    for label, key in (("New pages", 'new'), ("Pages not seen this crawl", 'removed'), ("Changed pages", 'changed')):
+        if report[key]:
+            with st.expander(f"{label} ({len(report[key])})"):
+                st.dataframe(pd.DataFrame({'URL': report[key]}), width='stretch', hide_index=True)
+
+def render_when_ready(jobs, panels):
+    """Fill each tab as soon as the jobs it needs have finished, in whatever order they finish."""
+    waiting = []
+    for tab, needs, message, render in panels:
+        with tab:
+            waiting.append((st.empty(), needs, message, render))
+
+    while waiting:
+        for panel in list(waiting):
+            holder, needs, message, render = panel
+            if jobs.done(*needs):
+                with holder.container():
+                    render()
+                waiting.remove(panel)
+            else:
+                holder.info(f"⏳ {message() if callable(message) else message}")
+        if waiting:
+            jobs.wait_any({name for _, needs, _, _ in waiting for name in needs if not jobs.done(name)}, timeout=1.0)
 
 # --- Main App Logic ---
 def main():
@@ -295,8 +387,8 @@ def main():
             url = url_input if url_input.startswith(('http://', 'https://')) else 'https://' + url_input
             with st.spinner("Analyzing text..."):
                 page_data = audit_page(url)
-                if page_data and page_data.get('soup'):
-                    st.session_state.suggestions = suggest_keywords(page_data['soup'])
+                if page_data and not page_data.error:
+                    st.session_state.suggestions = suggest_keywords(page_data)
                 else:
                     st.session_state.suggestions = []
         else:
@@ -309,61 +401,135 @@ def main():
                 st.session_state.keyword_input = suggestion
                 st.rerun()
 
-    crawl_pages = st.sidebar.slider("Pages to Crawl (incl. homepage)", 1, 10, 3)
+    st.sidebar.subheader("Crawl Settings")
+    crawl_pages = st.sidebar.number_input("Pages to Crawl (incl. homepage)", min_value=1, max_value=100000, value=3)
+    crawl_depth = st.sidebar.slider("Max Crawl Depth", 1, 10, 2)
+    crawl_concurrency = st.sidebar.slider("Concurrent Connections", 1, 128, DEFAULT_CONCURRENCY)
+    crawl_per_host = st.sidebar.slider("Max Connections per Host", 1, 64, DEFAULT_PER_HOST, help="Ceiling for connections to the audited site. The crawl adapts below it: more while response times stay flat, fewer on 429/503 answers or slowing responses.")
+    initial_per_host = st.sidebar.slider("Initial Connections per Host", 1, 64, politeness.DEFAULT_INITIAL)
+    max_page_mb = st.sidebar.number_input("Max Page Size (MB)", min_value=0.5, max_value=100.0,
+                                          value=http_client.DEFAULT_MAX_BYTES / 2**20, step=0.5)
+    max_page_bytes = int(max_page_mb * 2**20)
+    parse_processes = st.sidebar.slider("Parse Processes", 0, os.cpu_count() or 1, 0, help="Parse crawled pages in separate processes so parsing uses several CPU cores. 0 parses in the download threads.")
+    ignored_params = st.sidebar.text_input("Ignore Query Parameters", ", ".join(STRIP_PARAMS), help="Query parameters dropped from crawled links, so tracking variants of a page are crawled once. A trailing * matches any suffix; * alone ignores every query string.")
+    respect_robots = st.sidebar.checkbox("Respect robots.txt", value=True, help="Skip pages the site's robots.txt disallows while crawling.")
+    seed_from_sitemaps = st.sidebar.checkbox("Seed Crawl from Sitemaps", help="Also crawl the URLs listed in the site's sitemaps (robots.txt Sitemap: lines and /sitemap.xml), streamed in as the crawl needs them.")
+    inventory_assets = st.sidebar.checkbox("Asset Inventory", help="List every script, stylesheet and image the crawled pages use, checked once per unique asset.")
+    check_links = st.sidebar.checkbox("Check Links", help="Check every link, image and asset URL on the crawled pages for broken targets. Each unique URL is requested once and the result is cached for a day.")
+    incremental_mode = st.sidebar.checkbox("Incremental Re-audit", help="Compare with the last crawl of this site and re-run the SEO checks only on pages whose content changed.")
+    unfinished_crawls = {job['job_id']: job for job in crawl_store.default_store().unfinished_jobs()}
+    resume_job = st.sidebar.selectbox("Resume Crawl", [None, *unfinished_crawls], format_func=lambda job_id: "Start a new crawl" if job_id is None else format_crawl_job(unfinished_crawls[job_id]), help="Crawls are checkpointed as they run. Pick an interrupted crawl to continue it with its original URL and crawl settings; pages it already audited are not fetched again.")
+    distributed = st.sidebar.checkbox("Distributed Crawl", help="Queue the crawl for worker processes instead of crawling in the app. Start workers with `python crawl_worker.py`; Max Connections per Host is then the limit for all workers together.")
+
+    st.sidebar.subheader("PageSpeed Settings")
+    psi_strategies = st.sidebar.multiselect("Strategies", PSI_STRATEGIES, default=list(PSI_STRATEGIES), format_func=lambda strategy: STRATEGY_LABELS.get(strategy, strategy))
+    psi_crawl_pages = st.sidebar.number_input("Also Test Crawled Pages", min_value=0, max_value=100000, value=0, help="Queue PageSpeed Insights for this many crawled pages after the crawl finishes. Calls are paced to the API quota; a batch cut short by the daily quota resumes on the next audit of the site.")
 
     st.title("🕵️‍♀️ Website Auditor Pro")
     st.markdown(f"### Comprehensive Audit for `{url_input}`")
     
     if st.sidebar.button("🚀 Audit Website", type="primary"):
         url = url_input if url_input.startswith(('http://', 'https://')) else 'https://' + url_input
-
-        with st.spinner(f"Auditing main page: {url}..."):
-            main_page_data = audit_page(url)
-            if main_page_data.get('error'):
-                st.error(f"Failed to audit main page: {main_page_data['error']}"); return
-            
-            psi_results, psi_error = run_pagespeed_insights(url)
-            if psi_error: st.warning(f"Could not get Google PageSpeed data: {psi_error}")
-
-        crawl_data = [main_page_data]
-        if crawl_pages > 1 and main_page_data.get('soup'):
-            with st.spinner(f"Crawling up to {crawl_pages-1} additional pages..."):
-                internal_links = get_internal_links(url, main_page_data['soup'])
-                links_to_crawl = list(internal_links - {url})[:crawl_pages-1]
-                
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    crawl_results = executor.map(audit_page, links_to_crawl)
-                crawl_data.extend(list(crawl_results))
-        
+        if resume_job is not None:
+            url = unfinished_crawls[resume_job]['start_url']
+            crawl_pages = unfinished_crawls[resume_job]['options']['max_pages']
+        st.session_state.audit_jobs = audit_jobs.start_audit(
+            url, audit_page, run_pagespeed_insights, max_bytes=max_page_bytes,
+            max_pages=crawl_pages, max_depth=crawl_depth, concurrency=crawl_concurrency,
+            per_host=crawl_per_host, parse_processes=parse_processes, incremental_mode=incremental_mode,
+            psi_strategies=psi_strategies or ['mobile'], psi_crawl_pages=psi_crawl_pages,
+            psi_api_key=st.secrets.get("GOOGLE_PAGESPEED_API_KEY"), inventory_assets=inventory_assets,
+            seed_from_sitemaps=seed_from_sitemaps, respect_robots=respect_robots, initial_per_host=initial_per_host,
+            strip_params=[name.strip() for name in ignored_params.split(',') if name.strip()], resume_job=resume_job,
+            distributed=distributed, check_links=check_links,
+        )
         st.session_state.audit_ran = True
-        st.session_state.main_page_data = main_page_data
-        st.session_state.psi_results = psi_results
-        st.session_state.crawl_data = crawl_data
+        st.session_state.crawl_pages = crawl_pages
         st.session_state.audited_keyword = keyword_input
         st.rerun()
 
     if st.session_state.get('audit_ran'):
-        main_page_data = st.session_state.main_page_data
-        psi_results = st.session_state.psi_results
-        crawl_data = st.session_state.crawl_data
-        psi_report = psi_results.get('lighthouseResult', {}) if psi_results else {}
+        jobs = st.session_state.audit_jobs
         
         audited_keyword = st.session_state.get('audited_keyword', '')
         
         summary_tab, perf_tab, seo_tab, tech_tab, crawl_tab = st.tabs(
             ["Summary", "Performance", "SEO", "Technical", "Site Crawl"]
         )
-        
-        with summary_tab:
-            display_summary(psi_results, main_page_data['soup'])
-        with perf_tab:
-            display_performance_audit(psi_report)
-        with seo_tab:
-            display_seo_audit(main_page_data['soup'], audited_keyword)
-        with tech_tab:
-            display_technical_audit(main_page_data['soup'], main_page_data['url'])
-        with crawl_tab:
-            display_crawl_results(crawl_data)
+
+        def main_page():
+            page = jobs.result('main_page')
+            if page.error:
+                st.error(f"Failed to audit main page: {page.error}")
+                return None
+            return page
+
+        def psi_results():
+            psi_by_strategy = {}
+            for strategy, (results, error) in jobs.result('psi').items():
+                if error: st.warning(f"Could not get Google PageSpeed data ({strategy}): {error}")
+                psi_by_strategy[strategy] = results
+            return psi_by_strategy
+
+        def show_summary():
+            results = psi_results()
+            page = main_page()
+            if page:
+                if page.truncated:
+                    st.warning("Main page exceeded the download size cap; only its first part was audited.")
+                display_summary(results, page, load_psi_history(jobs.url, results))
+
+        def show_performance():
+            results = psi_results()
+            display_performance_audit(results, jobs.result('page_weight'))
+
+        def show_seo():
+            page = main_page()
+            if page: display_seo_audit(page, audited_keyword)
+
+        def show_technical():
+            page = main_page()
+            if page: display_technical_audit(page, jobs.result('robots'), jobs.result('sitemaps'))
+
+        def show_crawl():
+            crawl_data, crawl_diff = jobs.result('crawl')
+            display_crawl_results(crawl_data, jobs.result('link_graph') if 'link_graph' in jobs else None)
+            if crawl_diff:
+                display_crawl_diff(crawl_diff)
+
+        def show_assets():
+            display_asset_inventory(jobs.result('assets'))
+
+        def show_links():
+            display_link_check(jobs.result('links'))
+
+        def show_crawl_pagespeed():
+            display_crawl_pagespeed(jobs.result('psi_crawl'))
+            if jobs.progress.get('psi_quota_spent'):
+                st.warning("Daily PageSpeed Insights quota reached. The remaining pages stay queued and are tested on the next audit of this site.")
+
+        crawl_total = st.session_state.get('crawl_pages', 1)
+
+        def crawl_message():
+            if jobs.done('crawl'):
+                return "Analyzing the internal link graph..."
+            if 'crawl_queue_job' in jobs.progress:
+                return f"Crawling through the work queue (job `{jobs.progress['crawl_queue_job']}`)... {jobs.progress.get('crawl', 0)} of up to {crawl_total} pages audited. Pages are only crawled while `python crawl_worker.py` workers are running."
+            return f"Crawling (job `{jobs.crawl_job_id}`)... {jobs.progress.get('crawl', 0)} of up to {crawl_total} pages audited, {jobs.progress.get('crawl_per_host', initial_per_host)} connections to the site."
+        panels = [
+            (summary_tab, ('main_page', 'psi'), "Waiting for PageSpeed Insights...", show_summary),
+            (perf_tab, ('psi', 'page_weight'), "Waiting for PageSpeed Insights...", show_performance),
+            (seo_tab, ('main_page',), "Auditing main page...", show_seo),
+            (tech_tab, ('main_page', 'robots', 'sitemaps'), "Checking robots.txt and sitemaps...", show_technical),
+            (crawl_tab, ('crawl', 'link_graph') if 'link_graph' in jobs else ('crawl',), crawl_message, show_crawl),
+        ]
+        if 'assets' in jobs:
+            panels.append((crawl_tab, ('assets',), "Checking assets...", show_assets))
+        if 'links' in jobs:
+            panels.append((crawl_tab, ('links',), lambda: f"Checking links... {jobs.progress.get('links', 0)} URLs requested.", show_links))
+        if 'psi_crawl' in jobs:
+            panels.append((crawl_tab, ('psi_crawl',), lambda: f"PageSpeed Insights on crawled pages... {jobs.progress.get('psi_crawl', 0)} of {jobs.progress.get('psi_crawl_total', '?')} tests done.", show_crawl_pagespeed))
+        render_when_ready(jobs, panels)
 
 if __name__ == "__main__":
     main()
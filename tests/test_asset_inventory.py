@@ -0,0 +1,36 @@
+from asset_inventory import page_assets
+from link_checker import page_link_targets
+from page_record import PageRecord
+
+
+def redirected_page():
+    """/blog as linked, served from /blog/ after a redirect."""
+    return PageRecord(
+        'https://example.com/blog', final_url='https://example.com/blog/',
+        images=(('img/hero.png', 'Hero'), ('', None)),
+        assets=(('script', 'app.js', True), ('stylesheet', '/css/site.css', True)),
+        links=(('post.html', 'Post'),),
+    )
+
+
+def test_assets_resolve_against_the_url_the_page_was_served_from():
+    assert page_assets(redirected_page()) == [
+        ('script', 'https://example.com/blog/app.js', True),
+        ('stylesheet', 'https://example.com/css/site.css', True),
+        ('image', 'https://example.com/blog/img/hero.png', False),
+    ]
+
+
+def test_link_check_targets_of_a_redirected_page():
+    assert page_link_targets(redirected_page()) == {
+        'https://example.com/blog/post.html': 'link',
+        'https://example.com/blog/app.js': 'script',
+        'https://example.com/css/site.css': 'stylesheet',
+        'https://example.com/blog/img/hero.png': 'image',
+    }
+
+
+def test_unparsable_and_non_http_sources_are_skipped():
+    page = PageRecord('https://example.com/', images=(('https://[domain]/x.png', None), ('data:image/png;base64,AA', None)),
+                      assets=(('script', 'https://example.com/ok.js', False),))
+    assert page_assets(page) == [('script', 'https://example.com/ok.js', False)]
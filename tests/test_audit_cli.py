@@ -0,0 +1,16 @@
+import audit_cli
+import audit_core
+
+
+def test_a_page_that_raises_becomes_an_error_row(monkeypatch):
+    def audit_page(url, max_bytes):
+        if url.endswith('/bad'):
+            raise RuntimeError('parser crashed')
+        return audit_core.PageRecord(url, status_code=200)
+
+    monkeypatch.setattr(audit_core, 'audit_page', audit_page)
+    urls = [f'https://example.com/{n}' for n in range(5)] + ['https://example.com/bad']
+    records = {record.url: record for record in audit_cli.run_audits(iter(urls), workers=2, max_bytes=1000)}
+    assert sorted(records) == sorted(urls)
+    assert records['https://example.com/bad'].error == 'Audit failed: parser crashed'
+    assert not records['https://example.com/0'].error
@@ -0,0 +1,26 @@
+from incremental import build_snapshot, diff_snapshots
+from page_record import PageRecord
+
+
+def test_snapshot_is_keyed_by_normalized_url_and_reuses_unchanged_checks():
+    previous = {'https://example.com/blog': ('h1', {'title': False})}
+    records = [
+        PageRecord('https://EXAMPLE.com/blog/?utm_source=x', content_hash='h1'),
+        PageRecord('https://example.com/about', content_hash='h2'),
+    ]
+    snapshot, reused = build_snapshot(records, previous)
+    assert reused == 1
+    assert snapshot['https://example.com/blog'] == ('h1', {'title': False})
+    assert sorted(snapshot) == ['https://example.com/about', 'https://example.com/blog']
+
+    report = diff_snapshots(previous, snapshot)
+    assert (report['new'], report['removed'], report['changed'], report['unchanged']) == (
+        ['https://example.com/about'], [], [], 1)
+
+
+def test_changed_page_is_checked_again():
+    previous = {'https://example.com/': ('old', {'title': 'stale'})}
+    snapshot, reused = build_snapshot([PageRecord('https://example.com/', content_hash='new')], previous)
+    assert reused == 0
+    assert snapshot['https://example.com/'][1] != {'title': 'stale'}
+    assert diff_snapshots(previous, snapshot)['changed'] == ['https://example.com/']
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import audit_core
+import psi_scheduler
+from psi_history import PsiHistory
+
+BATCH = 'site:example.com'
+
+
+def psi_body(url, score=0.9):
+    return json.dumps({'id': url, 'lighthouseResult': {'categories': {'performance': {'score': score}}}}).encode()
+
+
+class StubPsi(ThreadingHTTPServer):
+    """Local PSI endpoint; `answers` maps a page URL to the (status, headers, body) of successive calls."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.answers = {}
+        self.calls = []
+
+    @property
+    def endpoint(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/runPagespeed'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = parse_qs(urlsplit(self.path).query)['url'][0]
+        self.server.calls.append((url, time.monotonic()))
+        answers = self.server.answers.get(url) or [(200, {}, psi_body(url))]
+        status, headers, body = answers.pop(0) if len(answers) > 1 else answers[0]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = StubPsi()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_core, 'default_history', lambda: PsiHistory(str(tmp_path / 'history.sqlite')))
+    monkeypatch.setattr(psi_scheduler, 'BACKOFF_BASE', 0.0)  # only Retry-After delays a retry
+    return psi_scheduler.PsiQueue(str(tmp_path / 'psi.sqlite'))
+
+
+def run(stub, queue, urls, **options):
+    queue.enqueue(BATCH, urls, ['mobile'])
+    scheduler = psi_scheduler.PsiScheduler('key', queue, per_second=100, workers=1, endpoint=stub.endpoint, **options)
+    progress = scheduler.run(BATCH)
+    return progress, {url: (report, error) for url, _, report, error in queue.results(BATCH)}
+
+
+def test_success(stub, queue):
+    progress, results = run(stub, queue, ['https://example.com/'])
+    assert (progress['done'], progress['failed'], progress['quota_spent']) == (1, 0, False)
+    report, error = results['https://example.com/']
+    assert error is None and report.scores['Performance'] == 90
+
+
+def test_429_is_retried_after_retry_after(stub, queue):
+    url = 'https://example.com/busy'
+    stub.answers[url] = [(429, {'Retry-After': '1'}, b''), (200, {}, psi_body(url))]
+    progress, results = run(stub, queue, [url])
+    assert progress['done'] == 1 and results[url][1] is None
+    (_, first), (_, second) = stub.calls
+    assert second - first >= 1.0
+
+
+def test_spent_daily_quota_leaves_rows_pending(stub, queue):
+    urls = [f'https://example.com/{n}' for n in range(3)]
+    progress, results = run(stub, queue, urls, per_day=2)
+    assert (progress['done'], progress['pending'], progress['quota_spent']) == (2, 1, True)
+    assert len(stub.calls) == 2
+
+
+@pytest.mark.parametrize('body', [b'<html>not json</html>', b'[]'])
+def test_malformed_body_fails_the_row_without_retrying(stub, queue, body):
+    url = 'https://example.com/broken'
+    stub.answers[url] = [(200, {}, body)]
+    progress, results = run(stub, queue, [url])
+    assert (progress['done'], progress['failed']) == (0, 1)
+    assert results[url][0] is None and results[url][1]
+    assert len(stub.calls) == 1
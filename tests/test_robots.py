@@ -0,0 +1,78 @@
+from robots import RobotsRules
+
+ROBOTS_TXT = '''
+User-agent: *
+Disallow: /private/
+Allow: /private/open
+Disallow: /*.pdf$
+Disallow: /search?
+Allow: /tie
+Disallow: /tie
+Disallow: /caf%C3%A9/
+Crawl-delay: 2.5
+
+User-agent: strictbot
+User-agent: OtherBot
+Disallow: /
+
+Sitemap: https://example.com/sitemap.xml
+'''
+
+
+def rules(text=ROBOTS_TXT):
+    return RobotsRules('https://example.com/robots.txt', 200, text)
+
+
+def test_can_fetch_uses_the_longest_matching_rule():
+    robots = rules()
+    assert robots.can_fetch('https://example.com/')
+    assert not robots.can_fetch('https://example.com/private/x')
+    assert robots.can_fetch('https://example.com/private/open/page')
+
+
+def test_allow_wins_a_tie():
+    assert rules().can_fetch('https://example.com/tie')
+
+
+def test_wildcards_and_end_anchor():
+    robots = rules()
+    assert not robots.can_fetch('https://example.com/files/report.pdf')
+    assert robots.can_fetch('https://example.com/files/report.pdf?download=1')
+    assert robots.can_fetch('https://example.com/files/report.pdfx')
+
+
+def test_query_strings_are_matched():
+    robots = rules()
+    assert not robots.can_fetch('https://example.com/search?q=shoes')
+    assert robots.can_fetch('https://example.com/search')
+
+
+def test_percent_encoding_is_compared_consistently():
+    robots = rules()
+    assert not robots.can_fetch('https://example.com/café/menu')
+    assert not robots.can_fetch('https://example.com/caf%c3%a9/menu')
+
+
+def test_agent_groups():
+    robots = rules()
+    assert not robots.can_fetch('https://example.com/', 'StrictBot')
+    assert not robots.can_fetch('https://example.com/', 'otherbot')
+    assert robots.can_fetch('https://example.com/', 'somebot')
+    assert robots.crawl_delay() == 2.5
+    assert robots.crawl_delay('strictbot') is None
+    assert robots.sitemaps == ['https://example.com/sitemap.xml']
+
+
+def test_missing_robots_allows_everything():
+    robots = RobotsRules('https://example.com/robots.txt', 404)
+    assert robots.can_fetch('https://example.com/private/x')
+    assert robots.crawl_delay() is None
+
+
+def test_unreachable_robots_disallows_everything():
+    robots = RobotsRules('https://example.com/robots.txt', 503, error='robots.txt answered HTTP 503')
+    assert not robots.can_fetch('https://example.com/')
+
+
+def test_empty_disallow_allows_everything():
+    assert rules('User-agent: *\nDisallow:\n').can_fetch('https://example.com/anything')
@@ -0,0 +1,71 @@
+import gzip
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import audit_cli
+from sitemaps import iter_site_sitemap_urls, iter_sitemap_urls
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def urlset(*urls):
+    return f'<urlset {NS}>' + ''.join(f'<url><loc>{url}</loc></url>' for url in urls) + '</urlset>'
+
+
+def index(*locations):
+    return f'<sitemapindex {NS}>' + ''.join(f'<sitemap><loc>{loc}</loc></sitemap>' for loc in locations) + \
+        '</sitemapindex>'
+
+
+@pytest.fixture
+def sitemaps(tmp_path):
+    def write(name, text, compress=False):
+        path = tmp_path / name
+        data = text.encode('utf-8')
+        path.write_bytes(gzip.compress(data) if compress else data)
+        return str(path)
+    return write
+
+
+def test_reads_urls_and_nested_gzipped_sitemaps(sitemaps):
+    child = sitemaps('child.xml.gz', urlset('https://example.com/b', 'https://example.com/c'), compress=True)
+    root = sitemaps('index.xml', index(child))
+    assert list(iter_sitemap_urls(sitemaps('urls.xml', urlset('https://example.com/a')))) == ['https://example.com/a']
+    assert list(iter_sitemap_urls(root)) == ['https://example.com/b', 'https://example.com/c']
+
+
+def test_failing_children_are_skipped_and_reported(sitemaps, tmp_path):
+    missing = str(tmp_path / 'missing.xml')
+    broken = sitemaps('broken.xml', urlset('https://example.com/partial').replace('</urlset>', ''))
+    good = sitemaps('good.xml', urlset('https://example.com/a'))
+    root = sitemaps('index.xml', index(missing, broken, good))
+
+    errors = []
+    urls = list(iter_sitemap_urls(root, lambda location, error: errors.append((location, type(error)))))
+    assert urls == ['https://example.com/partial', 'https://example.com/a']
+    assert errors == [(missing, FileNotFoundError), (broken, ET.ParseError)]
+
+
+def test_failure_of_the_sitemap_itself_propagates(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(iter_sitemap_urls(str(tmp_path / 'missing.xml')))
+
+
+def test_sitemap_index_cycles_are_read_once(sitemaps, tmp_path):
+    root = str(tmp_path / 'index.xml')
+    sitemaps('index.xml', index(root, sitemaps('a.xml', urlset('https://example.com/a'))))
+    assert list(iter_sitemap_urls(root)) == ['https://example.com/a']
+
+
+def test_site_sitemaps_skip_the_ones_that_fail(sitemaps, tmp_path):
+    good = sitemaps('good.xml', urlset('https://example.com/a'))
+    assert list(iter_site_sitemap_urls([str(tmp_path / 'missing.xml'), good])) == ['https://example.com/a']
+
+
+def test_cli_reports_failed_sitemaps_and_continues(sitemaps, tmp_path, capsys):
+    missing = str(tmp_path / 'missing.xml')
+    good = sitemaps('good.xml', urlset('https://example.com/a'))
+    root = sitemaps('index.xml', index(missing, good))
+    assert list(audit_cli.iter_input_urls([root, missing, good])) == ['https://example.com/a'] * 2
+    assert capsys.readouterr().err.count(f'Skipping sitemap {missing}') == 2
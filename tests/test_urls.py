@@ -0,0 +1,59 @@
+import pytest
+
+from urls import UrlSet, normalize_url
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTPS://Example.COM/a', 'https://example.com/a'),
+    ('https://example.com:443/a', 'https://example.com/a'),
+    ('http://example.com:80/a', 'http://example.com/a'),
+    ('http://example.com:8080/a', 'http://example.com:8080/a'),
+    ('https://example.com./a', 'https://example.com/a'),
+    ('https://example.com/a#section', 'https://example.com/a'),
+    ('https://example.com/a/', 'https://example.com/a'),
+    ('https://example.com', 'https://example.com/'),
+    ('https://example.com/', 'https://example.com/'),
+    ('https://example.com/a/./b/../c', 'https://example.com/a/c'),
+    ('https://example.com/%7Euser/%2f', 'https://example.com/~user/%2F'),
+    ('https://example.com/a?b=2&a=1', 'https://example.com/a?a=1&b=2'),
+    ('https://example.com/a?utm_source=x&id=3&gclid=y', 'https://example.com/a?id=3'),
+    ('https://example.com/a?utm_source=x', 'https://example.com/a'),
+    ('  https://example.com/a  ', 'https://example.com/a'),
+    ('https://User@Example.com/a', 'https://User@example.com/a'),
+    ('http://[::1]:8080/a', 'http://[::1]:8080/a'),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_normalize_url_leaves_other_schemes_alone():
+    for url in ('mailto:Someone@Example.com', 'javascript:void(0)', 'ftp://Example.com/a/'):
+        assert normalize_url(url) == url
+
+
+def test_normalize_url_strip_params():
+    url = 'https://example.com/a?ref=x&sort=asc&utm_medium=y'
+    assert normalize_url(url, ()) == 'https://example.com/a?ref=x&sort=asc&utm_medium=y'
+    assert normalize_url(url, ('ref', 'utm_*')) == 'https://example.com/a?sort=asc'
+    assert normalize_url(url, ('*',)) == 'https://example.com/a'
+
+
+def test_normalize_url_is_idempotent():
+    url = normalize_url('HTTPS://Example.com:443/a/./b/?z=1&utm_source=x&a=%7e#top')
+    assert normalize_url(url) == url
+
+
+def test_normalize_url_rejects_unparsable_urls():
+    with pytest.raises(ValueError):
+        normalize_url('https://[domain]/x')
+
+
+def test_url_set_grows_and_keeps_membership():
+    urls = [f'https://example.com/{n}' for n in range(5000)]
+    seen = UrlSet(urls[:10])
+    for url in urls:
+        seen.add(url)
+    seen.add(urls[0])
+    assert len(seen) == len(urls)
+    assert all(url in seen for url in urls)
+    assert 'https://example.com/other' not in seen
@@ -0,0 +1,96 @@
+import pytest
+
+import work_queue
+from page_record import PageRecord
+
+START = 'https://example.com/'
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return work_queue.WorkQueue(str(tmp_path / 'queue.sqlite'))
+
+
+def submit(queue, max_leased=8, interval=0.0, **options):
+    return queue.submit(START, {'max_pages': 100, 'max_depth': 3, **options}, max_leased, interval)
+
+
+def test_lease_and_ack_queue_the_links(queue):
+    job_id = submit(queue)
+    [lease] = queue.lease('a', 10)
+    assert (lease.job_id, lease.url, lease.depth) == (job_id, START, 0)
+    assert queue.lease('a', 10) == []  # nothing else is queued yet
+
+    assert queue.ack('a', lease, PageRecord(START), ['https://example.com/x', 'https://example.com/y'])
+    assert queue.progress(job_id) == {'queued': 2, 'leased': 0, 'done': 1, 'failed': 0}
+    assert sorted(lease.url for lease in queue.lease('a', 10)) == ['https://example.com/x', 'https://example.com/y']
+    assert [page.url for page in queue.results(job_id)] == [START]
+
+
+def test_links_are_deduplicated_by_normalized_url_but_queued_as_linked(queue):
+    job_id = submit(queue)
+    [lease] = queue.lease('a', 1)
+    queue.ack('a', lease, PageRecord(START), [
+        'https://example.com/blog/', 'https://example.com/blog', 'https://EXAMPLE.com/blog/?utm_source=x',
+        'https://example.com/',
+    ])
+    assert queue.progress(job_id)['queued'] == 1
+    assert [lease.url for lease in queue.lease('a', 10)] == ['https://example.com/blog/']
+
+
+def test_ack_respects_max_pages_and_max_depth(queue):
+    job_id = submit(queue, max_pages=3, max_depth=1)
+    [lease] = queue.lease('a', 1)
+    queue.ack('a', lease, PageRecord(START), [f'https://example.com/{n}' for n in range(5)])
+    assert queue.progress(job_id)['queued'] == 2
+
+    leases = queue.lease('a', 10)
+    queue.ack('a', leases[0], PageRecord(leases[0].url), ['https://example.com/deeper'])
+    assert queue.progress(job_id) == {'queued': 0, 'leased': 1, 'done': 2, 'failed': 0}
+
+
+def test_lease_keeps_each_host_within_max_leased(queue):
+    submit(queue, max_leased=2)
+    [lease] = queue.lease('a', 1)
+    queue.ack('a', lease, PageRecord(START), [f'https://example.com/{n}' for n in range(5)])
+    assert len(queue.lease('a', 10)) == 2
+    assert queue.lease('b', 10) == []
+
+
+def test_lease_spaces_start_times_by_interval(queue):
+    submit(queue, interval=2.0)
+    [lease] = queue.lease('a', 1)
+    queue.ack('a', lease, PageRecord(START), [f'https://example.com/{n}' for n in range(3)])
+    starts = [lease.start_at for lease in queue.lease('a', 10)]
+    assert [round(later - earlier, 6) for earlier, later in zip(starts, starts[1:])] == [2.0, 2.0]
+
+
+def test_expired_lease_is_requeued_and_the_old_holder_cannot_ack(queue):
+    job_id = submit(queue)
+    [stale] = queue.lease('a', 1, lease_seconds=-1)
+    [fresh] = queue.lease('b', 1)
+    assert fresh.url == stale.url
+
+    assert not queue.ack('a', stale, PageRecord(START), ['https://example.com/from-a'])
+    assert queue.progress(job_id) == {'queued': 0, 'leased': 1, 'done': 0, 'failed': 0}
+    assert queue.ack('b', fresh, PageRecord(START))
+    assert queue.progress(job_id)['done'] == 1
+
+
+def test_url_fails_after_max_attempts(queue):
+    job_id = submit(queue)
+    for _ in range(work_queue.MAX_ATTEMPTS):
+        assert len(queue.lease('a', 1, lease_seconds=-1)) == 1
+    assert queue.lease('a', 1) == []
+    assert queue.progress(job_id) == {'queued': 0, 'leased': 0, 'done': 0, 'failed': 1}
+    assert queue.pending() == 0
+
+
+def test_fail_requeues_only_for_the_lease_holder(queue):
+    job_id = submit(queue)
+    lease = queue.lease('a', 1)[0]
+    queue.fail('a', lease, 'boom')
+    assert queue.progress(job_id)['queued'] == 1
+
+    queue.fail('b', queue.lease('a', 1)[0], 'not the holder')
+    assert queue.progress(job_id)['leased'] == 1
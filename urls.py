@@ -0,0 +1,110 @@
+import hashlib
+import re
+from array import array
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+# --- URL normalization and a compact seen-set ---
+# Links are normalized once when they are extracted, so `/a`, `/a/`, `/a#x`
+# and `/a?utm_source=x` are one page to the crawler. Normalization lowercases
+# the scheme and host, drops default ports and fragments, resolves dot
+# segments, canonicalizes percent-escapes, strips trailing slashes and
+# tracking parameters, and sorts what is left of the query.
+# UrlSet remembers URLs as 64-bit hashes in an open-addressing array: about
+# 12 bytes per URL instead of a Python string plus a set entry (well over 100
+# bytes), so a million-URL crawl keeps its seen-set in ~12 MB. Two URLs share
+# a hash with a probability around n^2 / 2^65, about 3e-8 at a million URLs.
+
+# Names to drop from query strings; a trailing '*' matches any suffix, and
+# '*' alone drops every parameter.
+STRIP_PARAMS = ('utm_*', 'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', '_ga', '_gl')
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+_UNRESERVED = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+
+def _unescape_unreserved(match):
+    char = chr(int(match.group(0)[1:], 16))
+    return char if char in _UNRESERVED else match.group(0).upper()
+
+
+def _param_filter(strip_params):
+    names = frozenset(name for name in strip_params if not name.endswith('*'))
+    prefixes = tuple(name[:-1] for name in strip_params if name.endswith('*'))
+    return lambda name: name in names or name.startswith(prefixes)
+
+
+def normalize_url(url, strip_params=STRIP_PARAMS):
+    """Canonical form of an http(s) URL; other URLs come back unchanged."""
+    scheme, netloc, path, query, _ = urlsplit(url.strip())
+    scheme = scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url
+    userinfo, _, host = netloc.rpartition('@')
+    host, _, port = host.lower().partition(':') if not host.startswith('[') else (host.lower(), '', '')
+    host = host.rstrip('.')
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+    netloc = f'{userinfo}@{host}' if userinfo else host
+
+    if '/.' in path:
+        path = urlsplit(urljoin('http://h/', path)).path
+    path = _ESCAPE.sub(_unescape_unreserved, path).rstrip('/') or '/'
+    if query:
+        strip = _param_filter(strip_params)
+        params = [_ESCAPE.sub(_unescape_unreserved, param) for param in query.split('&') if param]
+        query = '&'.join(sorted(param for param in params if not strip(param.partition('=')[0])))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def url_hash(url):
+    """64-bit hash of a URL; never 0, which marks an empty UrlSet slot."""
+    digest = hashlib.blake2b(url.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class UrlSet:
+    """A set of URLs that stores only their 64-bit hashes (add, `in` and len)."""
+
+    MAX_LOAD = 0.7
+
+    def __init__(self, urls=(), capacity=1024):
+        size = 1024
+        while size * self.MAX_LOAD < capacity:
+            size *= 2
+        self._slots = array('Q', [0]) * size
+        self._len = 0
+        for url in urls:
+            self.add(url)
+
+    def _index(self, slots, value):
+        mask = len(slots) - 1
+        index = value & mask
+        while slots[index] and slots[index] != value:
+            index = (index + 1) & mask
+        return index
+
+    def add(self, url):
+        """Add url; return False when it was already present."""
+        value = url_hash(url)
+        index = self._index(self._slots, value)
+        if self._slots[index]:
+            return False
+        self._slots[index] = value
+        self._len += 1
+        if self._len > len(self._slots) * self.MAX_LOAD:
+            self._grow()
+        return True
+
+    def _grow(self):
+        slots = array('Q', [0]) * (len(self._slots) * 2)
+        for value in self._slots:
+            if value:
+                slots[self._index(slots, value)] = value
+        self._slots = slots
+
+    def __contains__(self, url):
+        return bool(self._slots[self._index(self._slots, url_hash(url))])
+
+    def __len__(self):
+        return self._len
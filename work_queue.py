@@ -0,0 +1,228 @@
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import urlsplit
+
+from storage import CACHE_DIR, lazy_default, open_db
+from urls import STRIP_PARAMS, normalize_url
+
+# --- Shared crawl work queue ---
+# A distributed crawl lives entirely in one SQLite file: every URL of a job is
+# a row that is queued, leased to a worker, done or failed. Workers
+# (crawl_worker.py, any number of processes sharing the file) lease a batch,
+# fetch it, and ack each page with its record and the links it found, which
+# are queued in the same transaction. A worker that dies simply lets its
+# leases expire and the rows go back to the queue; an ack only counts while
+# the worker still holds the lease.
+# URLs are fetched as linked, but deduplicated per job by their
+# urls.normalize_url form (with the job's 'strip_params' option).
+# Per-host limits are enforced at lease time, across all workers: at most
+# `max_leased` URLs of a host are out at once, and lease start times are
+# spaced `interval` seconds apart (robots.txt Crawl-delay or a requests/s cap).
+# SQLite needs the file on a local disk; workers on other machines need a
+# server-backed queue with the same methods.
+
+LEASE_SECONDS = 120
+DEFAULT_MAX_LEASED = 8
+MAX_ATTEMPTS = 3
+MAX_LEAD = 30  # never hand out a URL whose host slot starts further ahead than this
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS wq_jobs (
+    job_id TEXT PRIMARY KEY,
+    start_url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS wq_hosts (
+    host TEXT PRIMARY KEY,
+    max_leased INTEGER NOT NULL,
+    interval REAL NOT NULL,
+    next_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS wq_urls (
+    job_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    url_key TEXT NOT NULL,
+    host TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    record BLOB,
+    error TEXT,
+    UNIQUE (job_id, url_key)
+);
+CREATE INDEX IF NOT EXISTS wq_urls_host ON wq_urls (host, state);
+CREATE INDEX IF NOT EXISTS wq_urls_job ON wq_urls (job_id, state);
+'''
+
+
+class Lease:
+    __slots__ = ('token', 'job_id', 'url', 'depth', 'start_at')
+
+    def __init__(self, token, job_id, url, depth, start_at):
+        self.token = token        # row id, checked again on ack
+        self.job_id = job_id
+        self.url = url
+        self.depth = depth
+        self.start_at = start_at  # time.time() before which the host must not be contacted
+
+
+class WorkQueue:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        # Autocommit mode, so BEGIN IMMEDIATE can take the write lock before
+        # reading: two processes must not lease the same rows.
+        self._conn = open_db(path, _SCHEMA, timeout=30, isolation_level=None)
+
+    def _transaction(self, work, *args):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = work(*args)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def submit(self, start_url, options, max_leased, interval=0.0):
+        """Queue a crawl from start_url and return its job id.
+
+        options needs 'max_pages' and 'max_depth' and is handed to the workers
+        as is. max_leased and interval set the start URL's host limits.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        host = urlsplit(start_url).netloc
+
+        def work():
+            self._conn.execute('INSERT INTO wq_jobs (job_id, start_url, options, created_at) VALUES (?, ?, ?, ?)',
+                               (job_id, start_url, json.dumps(options), time.time()))
+            self._conn.execute(
+                'INSERT INTO wq_hosts (host, max_leased, interval, next_at) VALUES (?, ?, ?, 0) '
+                'ON CONFLICT (host) DO UPDATE SET max_leased = excluded.max_leased, interval = excluded.interval',
+                (host, max_leased, interval),
+            )
+            self._conn.execute(
+                "INSERT INTO wq_urls (job_id, url, url_key, host, depth, state) VALUES (?, ?, ?, ?, 0, 'queued')",
+                (job_id, start_url, normalize_url(start_url, options.get('strip_params', STRIP_PARAMS)), host),
+            )
+        self._transaction(work)
+        return job_id
+
+    def options(self, job_id):
+        with self._lock:
+            row = self._conn.execute('SELECT options FROM wq_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lease(self, worker, count, lease_seconds=LEASE_SECONDS):
+        """Hand out up to `count` URLs, within every host's limits."""
+        def work():
+            now = time.time()
+            self._conn.execute(
+                "UPDATE wq_urls SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, worker = NULL, "
+                "error = 'lease expired' WHERE state = 'leased' AND lease_until < ?", (MAX_ATTEMPTS, now),
+            )
+            leases = []
+            hosts = self._conn.execute(
+                "SELECT host, max_leased, interval, next_at FROM wq_hosts WHERE host IN "
+                "(SELECT DISTINCT host FROM wq_urls WHERE state = 'queued') ORDER BY next_at"
+            ).fetchall()
+            for host, max_leased, interval, next_at in hosts:
+                leased = self._conn.execute("SELECT COUNT(*) FROM wq_urls WHERE host = ? AND state = 'leased'",
+                                            (host,)).fetchone()[0]
+                room = min(max_leased - leased, count - len(leases))
+                if room <= 0:
+                    continue
+                rows = self._conn.execute(
+                    "SELECT rowid, job_id, url, depth FROM wq_urls WHERE host = ? AND state = 'queued' "
+                    "ORDER BY rowid LIMIT ?", (host, room),
+                ).fetchall()
+                for rowid, job_id, url, depth in rows:
+                    start_at = max(now, next_at)
+                    if start_at - now > MAX_LEAD:
+                        break
+                    next_at = start_at + interval
+                    leases.append(Lease(rowid, job_id, url, depth, start_at))
+                self._conn.execute('UPDATE wq_hosts SET next_at = ? WHERE host = ?', (next_at, host))
+                if len(leases) >= count:
+                    break
+            self._conn.executemany(
+                "UPDATE wq_urls SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE rowid = ?",
+                [(worker, lease.start_at + lease_seconds, lease.token) for lease in leases],
+            )
+            return leases
+        return self._transaction(work)
+
+    def ack(self, worker, lease, record, links=()):
+        """Store a finished page and queue its links; False if the lease was lost meanwhile."""
+        blob = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+
+        def work():
+            updated = self._conn.execute(
+                "UPDATE wq_urls SET state = 'done', record = ?, lease_until = NULL "
+                "WHERE rowid = ? AND worker = ? AND state = 'leased'", (blob, lease.token, worker),
+            ).rowcount
+            if not updated:
+                return False
+            options = json.loads(self._conn.execute('SELECT options FROM wq_jobs WHERE job_id = ?',
+                                                    (lease.job_id,)).fetchone()[0])
+            strip_params = options.get('strip_params', STRIP_PARAMS)
+            if lease.depth < options['max_depth']:
+                room = options['max_pages'] - self._conn.execute(
+                    'SELECT COUNT(*) FROM wq_urls WHERE job_id = ?', (lease.job_id,)).fetchone()[0]
+                for link in links:
+                    if room <= 0:
+                        break
+                    host = urlsplit(link).netloc
+                    self._conn.execute('INSERT OR IGNORE INTO wq_hosts (host, max_leased, interval, next_at) '
+                                       'VALUES (?, ?, 0, 0)', (host, DEFAULT_MAX_LEASED))
+                    room -= self._conn.execute(
+                        "INSERT OR IGNORE INTO wq_urls (job_id, url, url_key, host, depth, state) "
+                        "VALUES (?, ?, ?, ?, ?, 'queued')",
+                        (lease.job_id, link, normalize_url(link, strip_params), host, lease.depth + 1),
+                    ).rowcount
+            return True
+        return self._transaction(work)
+
+    def fail(self, worker, lease, error):
+        """Give a URL back after an unexpected error; it fails for good after MAX_ATTEMPTS leases."""
+        def work():
+            self._conn.execute(
+                "UPDATE wq_urls SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "worker = NULL, lease_until = NULL, error = ? WHERE rowid = ? AND worker = ? AND state = 'leased'",
+                (MAX_ATTEMPTS, error, lease.token, worker),
+            )
+        self._transaction(work)
+
+    def progress(self, job_id):
+        """{'queued': n, 'leased': n, 'done': n, 'failed': n} for the job."""
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM wq_urls WHERE job_id = ? GROUP BY state',
+                                      (job_id,)).fetchall()
+        return {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0, **dict(rows)}
+
+    def pending(self):
+        """URLs of any job that are queued or leased."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM wq_urls WHERE state IN ('queued', 'leased')").fetchone()[0]
+
+    def results(self, job_id):
+        """Yield the records of the job's finished pages."""
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM wq_urls WHERE job_id = ? AND state = 'done' ORDER BY rowid",
+                                      (job_id,)).fetchall()
+        for (blob,) in rows:
+            yield pickle.loads(zlib.decompress(blob))
+
+
+@lazy_default
+def default_queue():
+    return WorkQueue(os.path.join(CACHE_DIR, 'work_queue.sqlite'))